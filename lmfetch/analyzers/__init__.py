@@ -1,8 +1,8 @@
 """Import/dependency analyzer - follows imports to find related files."""
 
+import posixpath
 import re
-from dataclasses import dataclass
-from pathlib import Path
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -12,29 +12,64 @@ class ImportInfo:
     alias: str | None = None
 
 
+@dataclass
+class DependencyGraph:
+    """File dependency graph with both edge directions built once."""
+
+    forward: dict[str, set[str]] = field(default_factory=dict)  # path -> paths it imports
+    reverse: dict[str, set[str]] = field(default_factory=dict)  # path -> paths importing it
+
+
+@dataclass
+class ModuleIndex:
+    """Extension-less module paths mapped to the file an import resolves to."""
+
+    python: dict[str, str] = field(default_factory=dict)  # "pkg/mod" -> "pkg/mod.py"
+    javascript: dict[str, str] = field(default_factory=dict)  # "src/util" -> "src/util.ts"
+
+
+# Suffix -> resolution priority (lower wins), in the order imports are tried
+PYTHON_MODULE_SUFFIXES = {".py": 0, "/__init__.py": 1}
+JS_MODULE_SUFFIXES = {
+    ".ts": 0, ".tsx": 1, ".js": 2, ".jsx": 3, "/index.ts": 4, "/index.js": 5,
+}
+
+
+_JS_IMPORT_PATTERN = (
+    r"^[ \t]*(?:"
+    r"import[ \t]+.*?[ \t]+from[ \t]+['\"](?P<js_from>.+?)['\"]"
+    r"|import[ \t]+['\"](?P<js_side_effect>.+?)['\"]"
+    r"|require\(['\"](?P<js_require>.+?)['\"]\)"
+    r")"
+)
+
+# One alternation per language, scanned over the whole file with finditer.
+# Every branch ends in its own named group, so ``match.lastgroup`` names the
+# branch that matched and holds the module string.
 IMPORT_PATTERNS = {
-    "python": [
-        (r"^from\s+(\.+)?(\S+)\s+import", True),  # from x import y
-        (r"^import\s+(\S+)", False),  # import x
-    ],
-    "javascript": [
-        (r"^import\s+.*?\s+from\s+['\"](.+?)['\"]", False),
-        (r"^import\s+['\"](.+?)['\"]", False),
-        (r"require\(['\"](.+?)['\"]\)", False),
-    ],
-    "typescript": [
-        (r"^import\s+.*?\s+from\s+['\"](.+?)['\"]", False),
-        (r"^import\s+['\"](.+?)['\"]", False),
-        (r"require\(['\"](.+?)['\"]\)", False),
-    ],
-    "go": [
-        (r"^\s*\"(.+?)\"", False),  # inside import block
-        (r"^import\s+\"(.+?)\"", False),
-    ],
-    "rust": [
-        (r"^use\s+(\S+)", False),
-        (r"^mod\s+(\w+)", False),
-    ],
+    "python": re.compile(
+        r"^[ \t]*(?:"
+        r"from[ \t]+(?P<dots>\.+)?(?P<py_from>\S+)[ \t]+import"  # from x import y
+        r"|import[ \t]+(?P<py_import>\S+)"  # import x
+        r")",
+        re.MULTILINE,
+    ),
+    "javascript": re.compile(_JS_IMPORT_PATTERN, re.MULTILINE),
+    "typescript": re.compile(_JS_IMPORT_PATTERN, re.MULTILINE),
+    "go": re.compile(
+        r"^[ \t]*(?:"
+        r"\"(?P<go_block>.+?)\""  # inside import block
+        r"|import[ \t]+\"(?P<go_import>.+?)\""
+        r")",
+        re.MULTILINE,
+    ),
+    "rust": re.compile(
+        r"^[ \t]*(?:"
+        r"use[ \t]+(?P<rs_use>\S+)"
+        r"|mod[ \t]+(?P<rs_mod>\w+)"
+        r")",
+        re.MULTILINE,
+    ),
 }
 
 
@@ -43,124 +78,119 @@ def extract_imports(content: str, language: str | None) -> list[ImportInfo]:
         return []
 
     imports = []
-    patterns = IMPORT_PATTERNS[language]
-
-    for line in content.split("\n"):
-        line = line.strip()
-        for pattern, is_from_import in patterns:
-            match = re.match(pattern, line)
-            if match:
-                if is_from_import and language == "python":
-                    dots = match.group(1) or ""
-                    module = match.group(2)
-                    imports.append(ImportInfo(
-                        module=module,
-                        is_relative=bool(dots),
-                    ))
-                else:
-                    imports.append(ImportInfo(
-                        module=match.group(1),
-                        is_relative=match.group(1).startswith(".") if language in ("javascript", "typescript") else False,
-                    ))
-                break
+    is_js = language in ("javascript", "typescript")
+
+    for match in IMPORT_PATTERNS[language].finditer(content):
+        kind = match.lastgroup
+        assert kind is not None
+        module = match[kind]
+        if kind == "py_from":
+            is_relative = bool(match["dots"])
+        else:
+            is_relative = module.startswith(".") if is_js else False
+        imports.append(ImportInfo(module=module, is_relative=is_relative))
 
     return imports
 
 
+def _index_suffixes(
+    index: dict[str, str],
+    priorities: dict[str, int],
+    normalized: str,
+    path: str,
+    suffixes: dict[str, int],
+):
+    for suffix, priority in suffixes.items():
+        if normalized.endswith(suffix):
+            key = normalized[:-len(suffix)]
+            if key not in index or priority < priorities[key]:
+                index[key] = path
+                priorities[key] = priority
+
+
+def build_module_index(all_paths: set[str]) -> ModuleIndex:
+    """Index every file by the module path(s) an import could use for it."""
+    index = ModuleIndex()
+    py_priorities: dict[str, int] = {}
+    js_priorities: dict[str, int] = {}
+
+    for path in all_paths:
+        normalized = path.replace("\\", "/")
+        if normalized.startswith("./"):
+            normalized = normalized[2:]
+        _index_suffixes(index.python, py_priorities, normalized, path, PYTHON_MODULE_SUFFIXES)
+        _index_suffixes(index.javascript, js_priorities, normalized, path, JS_MODULE_SUFFIXES)
+
+    return index
+
+
 def resolve_import_to_path(
     import_info: ImportInfo,
     source_path: str,
-    all_paths: set[str],
+    index: ModuleIndex,
     language: str | None,
 ) -> str | None:
     """Try to resolve an import to an actual file path."""
     if not language:
         return None
 
-    source = Path(source_path)
     module = import_info.module
 
     if language == "python":
         # Convert module.path to module/path
-        module_path = module.replace(".", "/")
-        candidates = [
-            f"{module_path}.py",
-            f"{module_path}/__init__.py",
-        ]
+        key = module.replace(".", "/")
         if import_info.is_relative:
-            base = source.parent
-            candidates = [str(base / c) for c in candidates]
+            key = posixpath.join(posixpath.dirname(source_path.replace("\\", "/")), key)
+        return index.python.get(posixpath.normpath(key))
     elif language in ("javascript", "typescript"):
-        if module.startswith("."):
-            base = source.parent
-            candidates = [
-                str(base / f"{module}.ts"),
-                str(base / f"{module}.tsx"),
-                str(base / f"{module}.js"),
-                str(base / f"{module}.jsx"),
-                str(base / f"{module}/index.ts"),
-                str(base / f"{module}/index.js"),
-            ]
-        else:
+        if not module.startswith("."):
             return None  # node_modules, skip
-    else:
-        return None
-
-    for candidate in candidates:
-        # Normalize path
-        candidate = candidate.replace("\\", "/")
-        if candidate.startswith("./"):
-            candidate = candidate[2:]
-        if candidate in all_paths:
-            return candidate
+        key = posixpath.join(posixpath.dirname(source_path.replace("\\", "/")), module)
+        return index.javascript.get(posixpath.normpath(key))
 
     return None
 
 
 def build_dependency_graph(
     files: dict[str, tuple[str, str | None]],  # path -> (content, language)
-) -> dict[str, set[str]]:
+) -> DependencyGraph:
     """Build a graph of file dependencies.
 
-    Returns dict mapping file path to set of paths it imports.
+    ``forward`` maps each file path to the set of paths it imports, and
+    ``reverse`` maps each path to the set of files importing it.
     """
-    all_paths = set(files.keys())
+    index = build_module_index(set(files.keys()))
     graph: dict[str, set[str]] = {path: set() for path in files}
+    reverse_graph: dict[str, set[str]] = {path: set() for path in files}
 
     for path, (content, language) in files.items():
         imports = extract_imports(content, language)
         for imp in imports:
-            resolved = resolve_import_to_path(imp, path, all_paths, language)
+            resolved = resolve_import_to_path(imp, path, index, language)
             if resolved:
                 graph[path].add(resolved)
+                reverse_graph[resolved].add(path)
 
-    return graph
+    return DependencyGraph(forward=graph, reverse=reverse_graph)
 
 
 def get_related_files(
     target_files: set[str],
-    graph: dict[str, set[str]],
+    graph: DependencyGraph,
     depth: int = 2,
 ) -> set[str]:
     """Get files related to target files (imports and importers)."""
     related = set(target_files)
 
-    # Build reverse graph (what imports what)
-    reverse_graph: dict[str, set[str]] = {path: set() for path in graph}
-    for path, imports in graph.items():
-        for imp in imports:
-            if imp in reverse_graph:
-                reverse_graph[imp].add(path)
-
     # BFS to find related files
     frontier = set(target_files)
     for _ in range(depth):
-        next_frontier = set()
+        next_frontier: set[str] = set()
         for path in frontier:
             # Files this imports
-            next_frontier.update(graph.get(path, set()))
+            next_frontier.update(graph.forward.get(path, ()))
             # Files that import this
-            next_frontier.update(reverse_graph.get(path, set()))
+            next_frontier.update(graph.reverse.get(path, ()))
         next_frontier -= related
         related.update(next_frontier)
         frontier = next_frontier
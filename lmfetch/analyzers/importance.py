@@ -1,5 +1,6 @@
 """File importance scoring - ranks files by structural importance."""
 
+from collections import Counter
 from pathlib import Path
 
 # Files that are typically entry points or important
@@ -27,17 +28,21 @@ LOW_IMPORTANCE_DIRS = [
     "migrations", "fixtures",
 ]
 
+_HIGH_IMPORTANCE = frozenset(pat.lower() for pat in HIGH_IMPORTANCE_PATTERNS)
+_IMPORTANT_DIRS = frozenset(IMPORTANT_DIRS)
+_LOW_IMPORTANCE_DIRS = frozenset(LOW_IMPORTANCE_DIRS)
+
 
 def compute_file_importance(path: str) -> float:
     """Compute importance score for a file (0.0 to 1.0)."""
     p = Path(path)
     name = p.name.lower()
-    parts = [part.lower() for part in p.parts]
+    parts = {part.lower() for part in p.parts}
 
     score = 0.5  # Base score
 
     # High importance files
-    if name in [pat.lower() for pat in HIGH_IMPORTANCE_PATTERNS]:
+    if name in _HIGH_IMPORTANCE:
         score += 0.3
 
     # Entry point patterns
@@ -49,16 +54,12 @@ def compute_file_importance(path: str) -> float:
         score += 0.1
 
     # Important directories
-    for important_dir in IMPORTANT_DIRS:
-        if important_dir in parts:
-            score += 0.1
-            break
+    if not _IMPORTANT_DIRS.isdisjoint(parts):
+        score += 0.1
 
     # Low importance directories
-    for low_dir in LOW_IMPORTANCE_DIRS:
-        if low_dir in parts:
-            score -= 0.2
-            break
+    if not _LOW_IMPORTANCE_DIRS.isdisjoint(parts):
+        score -= 0.2
 
     # Deeper files are often less important
     depth = len(p.parts)
@@ -73,16 +74,29 @@ def compute_file_importance(path: str) -> float:
     return max(0.0, min(1.0, score))
 
 
+def build_centrality_index(dependency_graph: dict[str, set[str]]) -> dict[str, int]:
+    """Count incoming edges (files that import it) for every file in the graph."""
+    incoming_counts: Counter[str] = Counter()
+    for deps in dependency_graph.values():
+        incoming_counts.update(deps)
+    return incoming_counts
+
+
 def compute_centrality(
     path: str,
+    incoming_counts: dict[str, int],
     dependency_graph: dict[str, set[str]],
 ) -> float:
-    """Compute how central a file is based on imports (PageRank-like)."""
+    """Compute how central a file is based on imports (PageRank-like).
+
+    ``incoming_counts`` comes from ``build_centrality_index`` and should be
+    built once per graph, not per file.
+    """
     if path not in dependency_graph:
         return 0.0
 
     # Count incoming edges (files that import this)
-    incoming = sum(1 for deps in dependency_graph.values() if path in deps)
+    incoming = incoming_counts.get(path, 0)
 
     # Count outgoing edges (files this imports)
     outgoing = len(dependency_graph.get(path, set()))
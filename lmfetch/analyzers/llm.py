@@ -1,10 +1,89 @@
 """LLM-powered smart analysis using fast/cheap models."""
 
 import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+# Exact-match cache for model outputs, keyed by a hash of the inputs. Hot
+# entries live in memory; everything is persisted in the SQLite cache so
+# repeat runs skip the network.
+LLM_MEMORY_CACHE_SIZE = 100
+_memory_cache: OrderedDict[str, str] = OrderedDict()
+_store = None
+
+
+def _get_store():
+    global _store
+    if _store is None:
+        from ..cache import SQLiteCache
+        _store = SQLiteCache()
+    return _store
+
+
+def _cache_key(kind: str, *parts: str) -> str:
+    digest = hashlib.blake2b(kind.encode(), digest_size=16)
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(part.encode())
+    return digest.hexdigest()
+
+
+async def _cache_get_many(keys: list[str]) -> dict[str, str]:
+    found: dict[str, str] = {}
+    missing: list[str] = []
+    for key in keys:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            found[key] = _memory_cache[key]
+        else:
+            missing.append(key)
+    if missing:
+        # One SELECT for the whole batch, off the event loop
+        try:
+            stored = await asyncio.to_thread(lambda: _get_store().get_llm_results(missing))
+        except Exception:
+            stored = {}
+        for key, value in stored.items():
+            _remember(key, value)
+        found.update(stored)
+    return found
+
+
+async def _cache_set_many(results: dict[str, str]):
+    if not results:
+        return
+    for key, value in results.items():
+        _remember(key, value)
+    try:
+        await asyncio.to_thread(lambda: _get_store().save_llm_results(results))
+    except Exception:
+        pass
+
+
+async def _cache_get(key: str) -> str | None:
+    return (await _cache_get_many([key])).get(key)
+
+
+async def _cache_set(key: str, value: str):
+    await _cache_set_many({key: value})
+
+
+def _remember(key: str, value: str):
+    _memory_cache[key] = value
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > LLM_MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
 
 
 async def summarize_chunk(content: str, max_length: int = 200) -> str:
     """Summarize a code chunk using a fast model."""
+    key = _cache_key("summary", content[:3000])
+    cached = await _cache_get(key)
+    if cached is not None:
+        return cached[:max_length]
+
     try:
         from ai_query import generate_text, google
 
@@ -13,7 +92,9 @@ async def summarize_chunk(content: str, max_length: int = 200) -> str:
             system="You are a code summarizer. Output ONLY a brief 1-2 sentence summary of what this code does. No markdown, no preamble.",
             prompt=f"Summarize this code:\n\n{content[:3000]}",
         )
-        return result.text.strip()[:max_length]
+        summary = result.text.strip()
+        await _cache_set(key, summary)
+        return summary[:max_length]
     except Exception:
         # Fallback: first line or docstring
         lines = content.strip().split("\n")
@@ -28,6 +109,11 @@ async def summarize_chunk(content: str, max_length: int = 200) -> str:
 
 async def compute_relevance_score(query: str, content: str) -> float:
     """Use fast model to score relevance of content to query."""
+    key = _cache_key("relevance", query, content[:2000])
+    cached = await _cache_get(key)
+    if cached is not None:
+        return float(cached)
+
     try:
         from ai_query import generate_text, google
 
@@ -36,8 +122,9 @@ async def compute_relevance_score(query: str, content: str) -> float:
             system="You are a relevance scorer. Output ONLY a number from 0.0 to 1.0 indicating how relevant the code is to the query. Just the number, nothing else.",
             prompt=f"Query: {query}\n\nCode:\n{content[:2000]}",
         )
-        score = float(result.text.strip())
-        return max(0.0, min(1.0, score))
+        score = max(0.0, min(1.0, float(result.text.strip())))
+        await _cache_set(key, str(score))
+        return score
     except Exception:
         return 0.5
 
@@ -58,6 +145,97 @@ async def expand_query(query: str) -> list[str]:
         return [query]
 
 
+async def generate_hypothetical_doc(query: str) -> str:
+    """Write a hypothetical code snippet answering the query (HyDE).
+
+    Raises when no generative model is available; callers fall back to the
+    plain query.
+    """
+    model_name = os.environ.get("LMFETCH_MODEL", "gemini-3-flash-preview")
+    key = _cache_key("hyde", model_name, query)
+    cached = await _cache_get(key)
+    if cached is not None:
+        return cached
+
+    from ai_query import generate_text, openai, google, anthropic
+    from ..utils import retry
+
+    # Simple heuristics for model selection
+    if "gpt" in model_name:
+        model = openai(model_name)
+    elif "claude" in model_name:
+        model = anthropic(model_name)
+    else:
+        # Default to google or what's available
+        model = google(model_name)
+
+    hyde_prompt = (
+        f"Write a hypothetical code snippet or documentation that answers the question: '{query}'. "
+        "Do not explain, just provide the code/doc."
+    )
+
+    @retry(retries=2, delay=0.5)
+    async def _gen_hyde():
+        return await generate_text(model=model, prompt=hyde_prompt)
+
+    hypothetical_doc = (await _gen_hyde()).text
+    await _cache_set(key, hypothetical_doc)
+    return hypothetical_doc
+
+
+async def score_chunks_batch(query: str, chunks: list[tuple[int, str]]) -> dict[int, float]:
+    """Score several (id, content) snippets against the query in one request.
+
+    Returns a mapping of id to a score from 0.0 to 1.0. Ids the model did not
+    score, or all of them if the response cannot be parsed, are left out.
+    """
+    scores: dict[int, float] = {}
+    keys = {chunk_id: _cache_key("relevance", query, content[:2000]) for chunk_id, content in chunks}
+    cached = await _cache_get_many(list(keys.values()))
+    uncached: list[tuple[int, str]] = []
+    for chunk_id, content in chunks:
+        if keys[chunk_id] in cached:
+            scores[chunk_id] = float(cached[keys[chunk_id]])
+        else:
+            uncached.append((chunk_id, content))
+
+    if not uncached:
+        return scores
+
+    try:
+        from ai_query import generate_text, google
+
+        snippets = "\n\n".join(
+            f"<snippet id=\"{chunk_id}\">\n{content[:2000]}\n</snippet>"
+            for chunk_id, content in uncached
+        )
+        result = await generate_text(
+            model=google("gemini-flash-lite-latest"),
+            system=(
+                "You are a relevance scorer. For each snippet, rate how relevant the code is to the query "
+                "from 0.0 to 1.0. Output ONLY a JSON object mapping each snippet id to its score, "
+                'e.g. {"3": 0.8, "7": 0.1}. No markdown, nothing else.'
+            ),
+            prompt=f"Query: {query}\n\n{snippets}",
+        )
+        text = result.text
+        parsed = json.loads(text[text.index("{"):text.rindex("}") + 1])
+    except Exception:
+        return scores
+
+    fresh: dict[str, str] = {}
+    for chunk_id, _ in uncached:
+        try:
+            score = float(parsed[str(chunk_id)])
+        except (KeyError, TypeError, ValueError):
+            continue
+        score = max(0.0, min(1.0, score))
+        scores[chunk_id] = score
+        fresh[keys[chunk_id]] = str(score)
+    await _cache_set_many(fresh)
+    return scores
+
+
 async def batch_summarize(chunks: list[tuple[str, str]], concurrency: int = 5) -> dict[str, str]:
     """Summarize multiple chunks concurrently."""
     semaphore = asyncio.Semaphore(concurrency)
@@ -77,22 +255,29 @@ async def batch_summarize(chunks: list[tuple[str, str]], concurrency: int = 5) -
 
 async def rerank_with_llm(
     query: str,
-    chunks: list[tuple[str, str, float]],  # (path, content, initial_score)
+    chunks: list[tuple[int, str, str, float]],  # (id, path, content, initial_score)
     top_k: int = 20,
-) -> list[tuple[str, str, float]]:
+    batch_size: int = 10,
+) -> list[tuple[int, str, str, float]]:
     """Rerank top chunks using LLM for better relevance."""
     # Only rerank top candidates
-    candidates = sorted(chunks, key=lambda x: x[2], reverse=True)[:top_k * 2]
+    candidates = sorted(chunks, key=lambda x: x[3], reverse=True)[:top_k * 2]
+
+    # Score candidates in a few batched prompts instead of one request each
+    batches = [
+        [(chunk_id, content) for chunk_id, _, content, _ in candidates[start:start + batch_size]]
+        for start in range(0, len(candidates), batch_size)
+    ]
+    llm_scores: dict[int, float] = {}
+    for batch_scores in await asyncio.gather(*[score_chunks_batch(query, batch) for batch in batches]):
+        llm_scores.update(batch_scores)
 
-    async def score_chunk(path: str, content: str, initial: float) -> tuple[str, str, float]:
-        llm_score = await compute_relevance_score(query, content)
+    reranked = []
+    for chunk_id, path, content, initial in candidates:
+        # Unscored candidates keep their initial score
+        llm_score = llm_scores.get(chunk_id, initial)
         # Blend initial score with LLM score
         final = initial * 0.4 + llm_score * 0.6
-        return path, content, final
-
-    reranked = await asyncio.gather(*[
-        score_chunk(path, content, score)
-        for path, content, score in candidates
-    ])
+        reranked.append((chunk_id, path, content, final))
 
-    return sorted(reranked, key=lambda x: x[2], reverse=True)
+    return sorted(reranked, key=lambda x: x[3], reverse=True)
@@ -1,19 +1,21 @@
 """Smart context builder - orchestrates sources, analyzers, chunkers, rankers."""
 
 import asyncio
+import os
+import sys
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Callable
 
-from .sources import CodebaseSource, GitHubSource, parse_github_url, SourceItem
-from .chunkers import CodeChunker
+from .sources import Source, CodebaseSource, GitHubSource, parse_github_url, SourceItem
+from .chunkers import Chunk, CodeChunker
 from .rankers import KeywordRanker, ScoredChunk
 from .rankers.hybrid import HybridRanker
-from .analyzers import build_dependency_graph, get_related_files
+from .analyzers import DependencyGraph, build_dependency_graph, get_related_files
 import concurrent.futures
 import hashlib
 import time
-from .tokens import count_tokens
 from .cache import SQLiteCache
 
 
@@ -21,6 +23,13 @@ def chunk_worker(chunker: CodeChunker, path: str, content: str, language: str |
     return chunker.chunk(path, content, language)
 
 
+# Scanned items, dependency graph and chunks of recently built sources, keyed by
+# source identity and fingerprint. Only ranking depends on the query, so repeat
+# queries in a long-lived process (e.g. the MCP server) skip I/O and parsing.
+PREPARE_CACHE_SIZE = int(os.environ.get("LMFETCH_PREPARE_CACHE_SIZE", "32"))
+_prepared: OrderedDict[tuple, tuple[list[SourceItem], DependencyGraph, list[Chunk]]] = OrderedDict()
+
+
 @dataclass
 class ContextResult:
     query: str
@@ -75,51 +84,39 @@ class ContextBuilder:
     import_depth: int = 1
     use_hybrid_ranking: bool = True
     use_smart_rerank: bool = False
+    # Keep prepared sources in memory for later builds in this process.
+    # One-shot callers (the CLI) turn this off to skip fingerprinting.
+    prepare_cache: bool = True
 
-    async def build(
+    async def _prepare(
         self,
-        path: str | Path,
-        query: str,
-        include: list[str] | None = None,
-        exclude: list[str] | None = None,
-        on_progress: Callable[[str], None] | None = None,
-        force_large: bool = False,
-    ) -> ContextResult:
-        def progress(msg: str):
-            if on_progress:
-                on_progress(msg)
-
-        path_str = str(path)
-
-        # Detect source type
-        if parse_github_url(path_str):
-            source = GitHubSource(
-                path_str, 
-                include=include, 
-                exclude=exclude,
-                force_large=force_large
-            )
-            source_type = "github"
-        else:
-            source = CodebaseSource(
-                path_str, 
-                include=include, 
-                exclude=exclude,
-                force_large=force_large
-            )
-            source_type = "codebase"
-
+        source: Source,
+        progress: Callable[[str], None],
+    ) -> tuple[list[SourceItem], DependencyGraph, list[Chunk]]:
+        """Scan, build the dependency graph and chunk every file of a source."""
         progress("Scanning code...")
-        items = await source.scan()
-
         # Initialize cache and prune old entries
         cache = SQLiteCache()
         cache.prune()
 
+        # Hash and look up each file as its read completes, overlapping the
+        # cache lookups with the reads still in flight
+        items = []
+        lookups: dict[str, tuple[str, list[Chunk] | None]] = {}
+        async for item in source.iter_items():
+            item.path = sys.intern(item.path)
+            if item.language:
+                item.language = sys.intern(item.language)
+            file_hash = hashlib.sha256(item.content.encode()).hexdigest()
+            lookups[item.path] = (file_hash, cache.get_file(item.path, file_hash))
+            items.append(item)
+        # Reads complete out of order; keep the result deterministic
+        items.sort(key=lambda item: item.path)
+
         # Build dependency graph
         progress(f"Building dependency graph for {len(items)} files...")
         files_dict = {item.path: (item.content, item.language) for item in items}
-        dep_graph = build_dependency_graph(files_dict) if self.follow_imports else {}
+        dep_graph = build_dependency_graph(files_dict) if self.follow_imports else DependencyGraph()
 
         # Chunk all files with caching
         progress("Chunking files...")
@@ -130,11 +127,7 @@ class ContextBuilder:
         items_to_chunk = []
         
         for item in items:
-            # Calculate hash
-            file_hash = hashlib.sha256(item.content.encode()).hexdigest()
-            
-            # Try to get from cache
-            cached_chunks = cache.get_file(item.path, file_hash)
+            file_hash, cached_chunks = lookups[item.path]
             if cached_chunks:
                 all_chunks.extend(cached_chunks)
                 cached_count += 1
@@ -160,6 +153,11 @@ class ContextBuilder:
                 
             # Save new chunks to cache
             for (item, file_hash), chunks in zip(items_to_chunk, results):
+                # Chunks come back unpickled from the workers; point them at
+                # the interned strings again
+                for c in chunks:
+                    c.path = item.path
+                    c.language = item.language
                 cache.save_file(
                     path=item.path,
                     file_hash=file_hash,
@@ -173,10 +171,72 @@ class ContextBuilder:
         if cached_count > 0:
             progress(f"Used cached chunks for {cached_count}/{len(items)} files")
 
+        return items, dep_graph, all_chunks
+
+    async def build(
+        self,
+        path: str | Path,
+        query: str,
+        include: list[str] | None = None,
+        exclude: list[str] | None = None,
+        on_progress: Callable[[str], None] | None = None,
+        force_large: bool = False,
+    ) -> ContextResult:
+        def progress(msg: str):
+            if on_progress:
+                on_progress(msg)
+
+        path_str = str(path)
+
+        # Detect source type
+        if parse_github_url(path_str):
+            source = GitHubSource(
+                path_str, 
+                include=include, 
+                exclude=exclude,
+                force_large=force_large
+            )
+            source_type = "github"
+        else:
+            source = CodebaseSource(
+                path_str, 
+                include=include, 
+                exclude=exclude,
+                force_large=force_large
+            )
+            source_type = "codebase"
+
+        use_prepared = self.prepare_cache and PREPARE_CACHE_SIZE > 0
+        signature = await source.fingerprint() if use_prepared else None
+        cache_key = (
+            source_type,
+            path_str,
+            tuple(include or ()),
+            tuple(exclude or ()),
+            force_large,
+            self.follow_imports,
+            signature,
+        )
+
+        if signature is not None and cache_key in _prepared:
+            _prepared.move_to_end(cache_key)
+            items, dep_graph, all_chunks = _prepared[cache_key]
+            progress(f"Using prepared index for {len(items)} files")
+        else:
+            items, dep_graph, all_chunks = await self._prepare(source, progress)
+            if use_prepared and signature is None:
+                # Sources like GitHub only know their signature once scanned
+                signature = await source.fingerprint()
+                cache_key = cache_key[:-1] + (signature,)
+            if use_prepared and signature is not None:
+                _prepared[cache_key] = (items, dep_graph, all_chunks)
+                while len(_prepared) > PREPARE_CACHE_SIZE:
+                    _prepared.popitem(last=False)
+
         # Initial ranking
         progress(f"Ranking {len(all_chunks)} chunks...")
         if self.use_hybrid_ranking:
-            ranker = HybridRanker(dependency_graph=dep_graph)
+            ranker = HybridRanker(dependency_graph=dep_graph.forward)
         else:
             ranker = KeywordRanker()
 
@@ -188,22 +248,18 @@ class ContextBuilder:
             from .analyzers.llm import rerank_with_llm
 
             chunks_for_rerank = [
-                (s.chunk.path, s.chunk.content, s.score)
-                for s in scored[:50]  # Top 50 candidates
+                (i, s.chunk.path, s.chunk.content, s.score)
+                for i, s in enumerate(scored[:50])  # Top 50 candidates
             ]
             reranked = await rerank_with_llm(query, chunks_for_rerank, top_k=30)
             # Rebuild scored list with new scores
-            path_content_to_chunk = {(s.chunk.path, s.chunk.content): s.chunk for s in scored}
-            new_scored = []
-            for path, content, new_score in reranked:
-                chunk = path_content_to_chunk.get((path, content))
-                if chunk:
-                    new_scored.append(ScoredChunk(chunk=chunk, score=new_score))
+            new_scored = [
+                ScoredChunk(chunk=scored[idx].chunk, score=new_score)
+                for idx, _, _, new_score in reranked
+            ]
             # Add remaining chunks that weren't reranked
-            reranked_keys = {(path, content) for path, content, _ in reranked}
-            for s in scored:
-                if (s.chunk.path, s.chunk.content) not in reranked_keys:
-                    new_scored.append(s)
+            reranked_ids = {idx for idx, _, _, _ in reranked}
+            new_scored.extend(s for i, s in enumerate(scored) if i not in reranked_ids)
             scored = new_scored
 
         # First pass: select top chunks within budget
@@ -213,7 +269,7 @@ class ContextBuilder:
         selected_paths = set()
 
         for s in scored:
-            chunk_tokens = count_tokens(s.content)
+            chunk_tokens = s.chunk.token_count
             if total_tokens + chunk_tokens > self.budget * 0.7:  # Reserve 30% for related files
                 continue
             selected.append(s)
@@ -223,7 +279,7 @@ class ContextBuilder:
 
         # Second pass: add related files via imports
         related_files_added = 0
-        if self.follow_imports and dep_graph:
+        if self.follow_imports and dep_graph.forward:
             related = get_related_files(selected_paths, dep_graph, depth=self.import_depth)
             related -= selected_paths  # Don't re-add already selected
 
@@ -231,7 +287,7 @@ class ContextBuilder:
             related_chunks = [s for s in scored if s.path in related and s.path not in selected_paths]
 
             for s in related_chunks:
-                chunk_tokens = count_tokens(s.content)
+                chunk_tokens = s.chunk.token_count
                 if total_tokens + chunk_tokens > self.budget:
                     continue
                 selected.append(s)
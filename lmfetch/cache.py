@@ -8,11 +8,12 @@ from pathlib import Path
 from typing import Any
 
 from .chunkers.base import Chunk
+from .utils import CACHE_ROOT
 
 
 class SQLiteCache:
     def __init__(self, db_path: Path | None = None):
-        self.db_path = db_path or Path.home() / ".cache" / "lmfetch" / "cache.db"
+        self.db_path = db_path or CACHE_ROOT / "cache.db"
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_db()
 
@@ -42,12 +43,38 @@ class SQLiteCache:
                     chunk_type TEXT,
                     name TEXT,
                     embedding BLOB,  -- JSON serialized list[float]
+                    token_count INTEGER,
                     FOREIGN KEY(file_path) REFERENCES files(path) ON DELETE CASCADE
                 )
                 """
             )
+            # Databases created before token_count was stored
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+            if "token_count" not in columns:
+                conn.execute("ALTER TABLE chunks ADD COLUMN token_count INTEGER")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS repos (
+                    owner TEXT NOT NULL,
+                    repo TEXT NOT NULL,
+                    head TEXT,
+                    checked_at REAL NOT NULL,
+                    PRIMARY KEY (owner, repo)
+                )
+                """
+            )
             conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks(file_path)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_files_access ON files(last_accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_access ON llm_results(last_accessed)")
 
     def get_file(self, path: str, current_hash: str) -> list[Chunk] | None:
         """Get cached chunks for a file if hash matches."""
@@ -71,13 +98,16 @@ class SQLiteCache:
             # Get chunks
             cursor = conn.execute(
                 """
-                SELECT content, start_line, end_line, chunk_type, name 
+                SELECT content, start_line, end_line, chunk_type, name, token_count
                 FROM chunks WHERE file_path = ? ORDER BY start_line
                 """,
                 (path,),
             )
             chunks = []
             for r in cursor:
+                if r[5] is None:
+                    # Cached before token counts were stored; re-chunk
+                    return None
                 chunks.append(Chunk(
                     path=path,
                     content=r[0],
@@ -85,7 +115,8 @@ class SQLiteCache:
                     end_line=r[2],
                     chunk_type=r[3],
                     name=r[4],
-                    language=language
+                    language=language,
+                    token_count=r[5],
                 ))
             return chunks
 
@@ -114,17 +145,61 @@ class SQLiteCache:
                     c.chunk_type,
                     c.name,
                     None, # Embedding (cached separately/later in this design, but slot reserved)
+                    c.token_count,
                 )
                 for c in chunks
             ]
             conn.executemany(
                 """
-                INSERT INTO chunks (file_path, content, start_line, end_line, chunk_type, name, embedding)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO chunks (file_path, content, start_line, end_line, chunk_type, name, embedding, token_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 data,
             )
 
+    def get_llm_results(self, keys: list[str]) -> dict[str, str]:
+        """Get cached LLM outputs for several content-hash keys in one query.
+
+        Reads don't refresh last_accessed: entries age out of prune() by
+        when they were written, which spares a write transaction per hit.
+        """
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(
+                f"SELECT key, value FROM llm_results WHERE key IN ({placeholders})", keys
+            ).fetchall()
+        return dict(rows)
+
+    def save_llm_results(self, results: dict[str, str]):
+        """Save LLM outputs under their content-hash keys in one transaction."""
+        if not results:
+            return
+        now = time.time()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO llm_results (key, value, last_accessed) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in results.items()],
+            )
+
+    def get_repo(self, owner: str, repo: str) -> tuple[str | None, float] | None:
+        """Get (head sha, last checked time) for a cached GitHub clone."""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT head, checked_at FROM repos WHERE owner = ? AND repo = ?",
+                (owner, repo),
+            ).fetchone()
+            return (row[0], row[1]) if row else None
+
+    def save_repo(self, owner: str, repo: str, head: str | None, checked_at: float):
+        """Record the head sha of a cached GitHub clone and when it was checked."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO repos (owner, repo, head, checked_at) VALUES (?, ?, ?, ?)",
+                (owner, repo, head, checked_at),
+            )
+
     def prune(self, max_age_days: int = 30):
         """Remove entries older than max_age_days."""
         cutoff = time.time() - (max_age_days * 86400)
@@ -132,6 +207,7 @@ class SQLiteCache:
             # Enable foreign keys for cascade delete
             conn.execute("PRAGMA foreign_keys = ON")
             conn.execute("DELETE FROM files WHERE last_accessed < ?", (cutoff,))
+            conn.execute("DELETE FROM llm_results WHERE last_accessed < ?", (cutoff,))
             return conn.total_changes
 
     def clear(self):
@@ -139,3 +215,5 @@ class SQLiteCache:
         with sqlite3.connect(self.db_path) as conn:
             conn.execute("DELETE FROM chunks")
             conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM llm_results")
+            conn.execute("DELETE FROM repos")
@@ -1,5 +1,6 @@
 """Base chunker interface."""
 
+import sys
 from dataclasses import dataclass
 
 
@@ -12,6 +13,13 @@ class Chunk:
     chunk_type: str  # "file", "function", "class", "section"
     name: str | None = None
     language: str | None = None
+    token_count: int = 0
+
+    def __post_init__(self):
+        # Many chunks share a path and language; keep one string object each.
+        self.path = sys.intern(self.path)
+        if self.language:
+            self.language = sys.intern(self.language)
 
     @property
     def header(self) -> str:
@@ -1,83 +1,128 @@
 """Code-aware chunker using regex patterns for common languages."""
 
 import re
+from bisect import bisect_right
+
 from .base import Chunk, Chunker
+from ..tokens import count_tokens
 
+# Each pattern captures the definition name as its only group and is matched
+# after a line's leading indentation.
 FUNCTION_PATTERNS = {
     "python": [
-        (r"^(async\s+)?def\s+(\w+)", "function"),
-        (r"^class\s+(\w+)", "class"),
+        (r"(?:async[ \t]+)?def[ \t]+(\w+)", "function"),
+        (r"class[ \t]+(\w+)", "class"),
     ],
     "javascript": [
-        (r"^(?:export\s+)?(?:async\s+)?function\s+(\w+)", "function"),
-        (r"^(?:export\s+)?class\s+(\w+)", "class"),
-        (r"^(?:export\s+)?const\s+(\w+)\s*=\s*(?:async\s*)?\(", "function"),
+        (r"(?:export[ \t]+)?(?:async[ \t]+)?function[ \t]+(\w+)", "function"),
+        (r"(?:export[ \t]+)?class[ \t]+(\w+)", "class"),
+        (r"(?:export[ \t]+)?const[ \t]+(\w+)[ \t]*=[ \t]*(?:async[ \t]*)?\(", "function"),
     ],
     "typescript": [
-        (r"^(?:export\s+)?(?:async\s+)?function\s+(\w+)", "function"),
-        (r"^(?:export\s+)?class\s+(\w+)", "class"),
-        (r"^(?:export\s+)?const\s+(\w+)\s*=\s*(?:async\s*)?\(", "function"),
-        (r"^(?:export\s+)?interface\s+(\w+)", "interface"),
-        (r"^(?:export\s+)?type\s+(\w+)", "type"),
+        (r"(?:export[ \t]+)?(?:async[ \t]+)?function[ \t]+(\w+)", "function"),
+        (r"(?:export[ \t]+)?class[ \t]+(\w+)", "class"),
+        (r"(?:export[ \t]+)?const[ \t]+(\w+)[ \t]*=[ \t]*(?:async[ \t]*)?\(", "function"),
+        (r"(?:export[ \t]+)?interface[ \t]+(\w+)", "interface"),
+        (r"(?:export[ \t]+)?type[ \t]+(\w+)", "type"),
     ],
     "go": [
-        (r"^func\s+(?:\([^)]+\)\s+)?(\w+)", "function"),
-        (r"^type\s+(\w+)\s+struct", "struct"),
-        (r"^type\s+(\w+)\s+interface", "interface"),
+        (r"func[ \t]+(?:\([^)\n]+\)[ \t]+)?(\w+)", "function"),
+        (r"type[ \t]+(\w+)[ \t]+struct", "struct"),
+        (r"type[ \t]+(\w+)[ \t]+interface", "interface"),
     ],
     "rust": [
-        (r"^(?:pub\s+)?(?:async\s+)?fn\s+(\w+)", "function"),
-        (r"^(?:pub\s+)?mod\s+(\w+)", "module"),
-        (r"^(?:pub\s+)?struct\s+(\w+)", "struct"),
-        (r"^(?:pub\s+)?enum\s+(\w+)", "enum"),
-        (r"^(?:pub\s+)?trait\s+(\w+)", "trait"),
-        (r"^impl(?:<[^>]+>)?\s+(\w+)", "impl"),
+        (r"(?:pub[ \t]+)?(?:async[ \t]+)?fn[ \t]+(\w+)", "function"),
+        (r"(?:pub[ \t]+)?mod[ \t]+(\w+)", "module"),
+        (r"(?:pub[ \t]+)?struct[ \t]+(\w+)", "struct"),
+        (r"(?:pub[ \t]+)?enum[ \t]+(\w+)", "enum"),
+        (r"(?:pub[ \t]+)?trait[ \t]+(\w+)", "trait"),
+        (r"impl(?:<[^>\n]+>)?[ \t]+(\w+)", "impl"),
     ],
     "java": [
-        (r"^(?:public\s+|protected\s+|private\s+)?(?:static\s+|final\s+|abstract\s+)*class\s+(\w+)", "class"),
-        (r"^(?:public\s+|protected\s+|private\s+)?(?:static\s+|final\s+)*interface\s+(\w+)", "interface"),
-        (r"^(?:public\s+|protected\s+|private\s+)?enum\s+(\w+)", "enum"),
+        (r"(?:public[ \t]+|protected[ \t]+|private[ \t]+)?(?:static[ \t]+|final[ \t]+|abstract[ \t]+)*class[ \t]+(\w+)", "class"),
+        (r"(?:public[ \t]+|protected[ \t]+|private[ \t]+)?(?:static[ \t]+|final[ \t]+)*interface[ \t]+(\w+)", "interface"),
+        (r"(?:public[ \t]+|protected[ \t]+|private[ \t]+)?enum[ \t]+(\w+)", "enum"),
     ],
 }
 
+
+# Words a definition line can start with, after indentation. A cheap literal
+# test on these lets the backtracking engine skip most lines without trying
+# every alternative.
+LEADING_KEYWORDS = {
+    "python": ["async", "def", "class"],
+    "javascript": ["export", "async", "function", "class", "const"],
+    "typescript": ["export", "async", "function", "class", "const", "interface", "type"],
+    "go": ["func", "type"],
+    "rust": ["pub", "async", "fn", "mod", "struct", "enum", "trait", "impl"],
+    "java": ["public", "protected", "private", "static", "final", "abstract", "class", "interface", "enum"],
+}
+
+
+def _compile_definitions(patterns: list[tuple[str, str]], keywords: list[str]):
+    # Name each pattern's capture d0, d1, ... so match.lastgroup identifies
+    # which alternative matched in a single scan over the file.
+    alternatives = "|".join(
+        pattern.replace(r"(\w+)", rf"(?P<d{i}>\w+)", 1)
+        for i, (pattern, _) in enumerate(patterns)
+    )
+    prefilter = r"(?=(?:" + "|".join(keywords) + r")\b)"
+    return re.compile(r"(?m)^[ \t]*" + prefilter + "(?:" + alternatives + ")")
+
+
+COMPILED_PATTERNS = {
+    lang: _compile_definitions(pats, LEADING_KEYWORDS[lang])
+    for lang, pats in FUNCTION_PATTERNS.items()
+}
+GROUP_TYPES = {
+    lang: {f"d{i}": def_type for i, (_, def_type) in enumerate(pats)}
+    for lang, pats in FUNCTION_PATTERNS.items()
+}
+
+_NEWLINE = re.compile("\n")
+
 MAX_CHUNK_LINES = 200
 MIN_CHUNK_LINES = 10
 
 
 class CodeChunker(Chunker):
     def chunk(self, path: str, content: str, language: str | None = None) -> list[Chunk]:
-        lines = content.split("\n")
+        chunks = self._split(path, content, language)
+        # Count once here so selection never re-tokenizes
+        for c in chunks:
+            c.token_count = count_tokens(c.content)
+        return chunks
 
-        if len(lines) <= MAX_CHUNK_LINES:
+    def _split(self, path: str, content: str, language: str | None) -> list[Chunk]:
+        # Count before splitting: small files never need the line list
+        line_count = content.count("\n") + 1
+        if line_count <= MAX_CHUNK_LINES:
             return [Chunk(
                 path=path,
                 content=content,
                 start_line=1,
-                end_line=len(lines),
+                end_line=line_count,
                 chunk_type="file",
                 language=language,
             )]
 
+        offsets = _line_offsets(content)
+
         if language and language in FUNCTION_PATTERNS:
-            chunks = self._chunk_by_definitions(path, lines, language)
+            chunks = self._chunk_by_definitions(path, content, offsets, language)
             if chunks:
                 return chunks
 
-        return self._chunk_by_size(path, lines, language)
+        return self._chunk_by_size(path, content, offsets, language)
 
-    def _chunk_by_definitions(self, path: str, lines: list[str], language: str) -> list[Chunk]:
-        patterns = FUNCTION_PATTERNS[language]
+    def _chunk_by_definitions(self, path: str, content: str, offsets: list[int], language: str) -> list[Chunk]:
+        group_types = GROUP_TYPES[language]
         definitions = []
 
-        for i, line in enumerate(lines):
-            for pattern, def_type in patterns:
-                match = re.match(pattern, line.strip())
-                if match:
-                    name = match.group(1) if match.lastindex else None
-                    if name and name in ("async", "export"):
-                        name = match.group(2) if match.lastindex >= 2 else None
-                    definitions.append((i, def_type, name))
-                    break
+        for match in COMPILED_PATTERNS[language].finditer(content):
+            line_num = bisect_right(offsets, match.start()) - 1
+            group = match.lastgroup
+            definitions.append((line_num, group_types[group], match.group(group)))
 
         if not definitions:
             return []
@@ -87,9 +132,9 @@ class CodeChunker(Chunker):
             if idx + 1 < len(definitions):
                 end_line = definitions[idx + 1][0]
             else:
-                end_line = len(lines)
+                end_line = len(offsets)
 
-            chunk_content = "\n".join(lines[line_num:end_line])
+            chunk_content = _slice_lines(content, offsets, line_num, end_line)
             chunks.append(Chunk(
                 path=path,
                 content=chunk_content,
@@ -101,7 +146,7 @@ class CodeChunker(Chunker):
             ))
 
         if definitions[0][0] > 0:
-            header_content = "\n".join(lines[:definitions[0][0]])
+            header_content = _slice_lines(content, offsets, 0, definitions[0][0])
             if header_content.strip():
                 chunks.insert(0, Chunk(
                     path=path,
@@ -114,11 +159,11 @@ class CodeChunker(Chunker):
 
         return chunks
 
-    def _chunk_by_size(self, path: str, lines: list[str], language: str | None) -> list[Chunk]:
+    def _chunk_by_size(self, path: str, content: str, offsets: list[int], language: str | None) -> list[Chunk]:
         chunks = []
-        for i in range(0, len(lines), MAX_CHUNK_LINES):
-            end = min(i + MAX_CHUNK_LINES, len(lines))
-            chunk_content = "\n".join(lines[i:end])
+        for i in range(0, len(offsets), MAX_CHUNK_LINES):
+            end = min(i + MAX_CHUNK_LINES, len(offsets))
+            chunk_content = _slice_lines(content, offsets, i, end)
             chunks.append(Chunk(
                 path=path,
                 content=chunk_content,
@@ -128,3 +173,15 @@ class CodeChunker(Chunker):
                 language=language,
             ))
         return chunks
+
+
+def _line_offsets(content: str) -> list[int]:
+    """Start offset of every line in content."""
+    return [0, *(m.end() for m in _NEWLINE.finditer(content))]
+
+
+def _slice_lines(content: str, offsets: list[int], start: int, end: int) -> str:
+    """Lines [start, end) of content, without the trailing newline."""
+    if end >= len(offsets):
+        return content[offsets[start]:]
+    return content[offsets[start]:offsets[end] - 1]
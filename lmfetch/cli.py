@@ -187,6 +187,7 @@ def cli(path, query, budget, output, context, include, exclude, model, fast, cle
             budget=budget_tokens,
             follow_imports=True,
             use_smart_rerank=not fast,
+            prepare_cache=False,
         )
 
         if not piped:
@@ -1,58 +1,190 @@
 """Embedding-based semantic ranker using ai-query."""
 
 import asyncio
+import contextlib
 import hashlib
 import json
+import logging
+import math
+import mmap
 import os
+import struct
 from pathlib import Path
 
 from ..chunkers.base import Chunk
 from .base import Ranker, ScoredChunk
-from ..utils import retry
+from ..utils import CACHE_ROOT, retry
+
+logger = logging.getLogger(__name__)
 
 
 def cosine_similarity(a: list[float], b: list[float]) -> float:
-    dot = sum(x * y for x, y in zip(a, b))
-    norm_a = sum(x * x for x in a) ** 0.5
-    norm_b = sum(x * x for x in b) ** 0.5
-    if norm_a == 0 or norm_b == 0:
+    # math.sumprod/hypot run the dot product and norms in C
+    norm = math.hypot(*a) * math.hypot(*b)
+    if norm == 0:
         return 0.0
-    return dot / (norm_a * norm_b)
+    return math.sumprod(a, b) / norm
+
+
+def normalize(v: list[float]) -> list[float]:
+    """Scale a vector to unit length so cosine similarity is a plain dot product."""
+    norm = math.hypot(*v)
+    if norm == 0:
+        return v
+    return [x / norm for x in v]
 
 
 class EmbeddingCache:
+    """Embeddings packed as fixed-stride float16 rows in one file.
+
+    ``embeddings.f16`` holds the vectors back to back and ``index.json`` maps
+    text hashes to row numbers, so a lookup is a slice of a memory map instead
+    of opening and parsing a file per text. Vectors are unit length, so half
+    precision costs nothing measurable in ranking and halves the file.
+
+    Several processes (CLI runs, the MCP server) may share the directory, so
+    appends and index writes hold an exclusive lock on ``.lock`` where the
+    platform supports it.
+    """
+
     def __init__(self, cache_dir: Path | None = None):
-        self.cache_dir = cache_dir or Path.home() / ".cache" / "lmfetch" / "embeddings"
+        self.cache_dir = cache_dir or CACHE_ROOT / "embeddings"
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._data_path = self.cache_dir / "embeddings.f16"
+        self._index_path = self.cache_dir / "index.json"
+        self._lock_path = self.cache_dir / ".lock"
         self._memory_cache: dict[str, list[float]] = {}
+        self._dims: int | None = None
+        self._rows: dict[str, int] = {}
+        self._dirty = False
+        self._mm: mmap.mmap | None = None
+        try:
+            index = json.loads(self._index_path.read_text())
+            if index.get("dtype") == "f16":
+                self._dims = index["dims"]
+                self._rows = index["rows"]
+            else:
+                # float32 layout from an older release; start over
+                (self.cache_dir / "embeddings.f32").unlink(missing_ok=True)
+        except Exception:
+            pass
+        self._import_legacy_files()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        if os.name == "nt":
+            yield
+            return
+        import fcntl
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _import_legacy_files(self):
+        """Move vectors from the older one-<key>.json-per-text layout into the store.
+
+        Each file is deleted once read, so this runs once per directory;
+        vectors whose dimensions differ from the store's are dropped.
+        """
+        legacy = [p for p in self.cache_dir.glob("*.json") if p != self._index_path]
+        if not legacy:
+            return
+        for path in legacy:
+            try:
+                embedding = json.loads(path.read_text())
+            except Exception:
+                embedding = None
+            if isinstance(embedding, list) and embedding and path.stem not in self._rows:
+                self._append(path.stem, normalize(embedding))
+            path.unlink(missing_ok=True)
+        self.flush()
 
     def _hash_text(self, text: str) -> str:
+        # Same key as the legacy layout's file names, so imported vectors hit
         return hashlib.sha256(text.encode()).hexdigest()[:16]
 
+    def _stride(self) -> int:
+        assert self._dims is not None  # rows exist only once dims are known
+        return self._dims * 2
+
+    def _read_row(self, row: int) -> list[float] | None:
+        start = row * self._stride()
+        end = start + self._stride()
+        if self._mm is None or len(self._mm) < end:
+            # Rows were appended since the file was mapped
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            with open(self._data_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(self._mm) < end:
+                return None
+        # typeshed lists no half-float format for cast(); "e" is valid at runtime
+        return memoryview(self._mm[start:end]).cast("e").tolist()  # type: ignore[call-overload]
+
     def get(self, text: str) -> list[float] | None:
         key = self._hash_text(text)
         if key in self._memory_cache:
             return self._memory_cache[key]
 
-        cache_file = self.cache_dir / f"{key}.json"
-        if cache_file.exists():
+        row = self._rows.get(key)
+        if row is not None:
             try:
-                embedding = json.loads(cache_file.read_text())
+                embedding = self._read_row(row)
+            except Exception:
+                embedding = None
+            if embedding:
                 self._memory_cache[key] = embedding
                 return embedding
-            except Exception:
-                pass
         return None
 
     def set(self, text: str, embedding: list[float]):
         key = self._hash_text(text)
         self._memory_cache[key] = embedding
-        cache_file = self.cache_dir / f"{key}.json"
+        self._append(key, embedding)
+
+    def _append(self, key: str, embedding: list[float]):
+        if self._dims is None:
+            self._dims = len(embedding)
+        if len(embedding) != self._dims:
+            return  # Different model dimensions; keep in memory only
+        row = struct.pack(f"{len(embedding)}e", *embedding)
         try:
-            cache_file.write_text(json.dumps(embedding))
+            with self._locked(), open(self._data_path, "ab") as f:
+                # Realign after a torn write so rows stay fixed-stride
+                padding = -f.seek(0, os.SEEK_END) % self._stride()
+                f.write(b"\0" * padding + row)
+                # O_APPEND writes land at the true end of file, wherever
+                # other writers left it; read the row back from there
+                end = f.tell()
+            self._rows[key] = (end - len(row)) // self._stride()
+            self._dirty = True
         except Exception:
             pass
 
+    def flush(self):
+        """Persist the row index after a batch of set() calls."""
+        if not self._dirty:
+            return
+        tmp_path = self._index_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with self._locked():
+                # Keep rows other processes indexed since this one loaded
+                try:
+                    index = json.loads(self._index_path.read_text())
+                except Exception:
+                    index = {}
+                if index.get("dtype") == "f16" and index.get("dims") == self._dims:
+                    self._rows = {**index["rows"], **self._rows}
+                tmp_path.write_text(json.dumps({"dtype": "f16", "dims": self._dims, "rows": self._rows}))
+                os.replace(tmp_path, self._index_path)
+            self._dirty = False
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+
 
 class EmbeddingRanker(Ranker):
     def __init__(
@@ -60,14 +192,30 @@ class EmbeddingRanker(Ranker):
         model: str = "text-embedding-005",
         batch_size: int = 20,
         provider_options: dict | None = None,
+        max_concurrency: int = 16,
     ):
         self.model = model
         self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
         self.provider_options = provider_options or {}
         self.cache = EmbeddingCache()
 
+    async def _embed_batch(self, batch: list[str]) -> list[list[float]]:
+        from ai_query import embed_many, google
+        # Determine provider and model object
+        model_obj = google.embedding(self.model)
+
+        response = await embed_many(
+            model=model_obj,
+            values=batch,
+            provider_options=self.provider_options,
+        )
+        logger.debug("received %d embeddings", len(response.embeddings))
+        return response.embeddings
+
     @retry(retries=3, delay=1.0)
     async def _embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts as unit-length vectors; failed texts map to []."""
         # Check cache first
         results: list[list[float] | None] = []
         uncached_indices: list[int] = []
@@ -82,28 +230,34 @@ class EmbeddingRanker(Ranker):
                 uncached_indices.append(i)
                 uncached_texts.append(text[:8000])  # Truncate for embedding
 
-        # Embed uncached texts in batches
+        # Embed uncached texts in concurrent batches. Sorting by length keeps
+        # each batch's size balanced.
         if uncached_texts:
-            for batch_start in range(0, len(uncached_texts), self.batch_size):
-                batch = uncached_texts[batch_start : batch_start + self.batch_size]
-                try:
-                    from ai_query import embed_many, google
-                    # Determine provider and model object
-                    model_obj = google.embedding(self.model)
-
-                    response = await embed_many(
-                        model=model_obj,
-                        values=batch,
-                        provider_options=self.provider_options,
-                    )
-                    print(response.embeddings)
-                    for j, embedding in enumerate(response.embeddings):
-                        idx = uncached_indices[batch_start + j]
-                        results[idx] = embedding
-                        self.cache.set(texts[idx], embedding)
-                except Exception:
+            order = sorted(range(len(uncached_texts)), key=lambda k: len(uncached_texts[k]))
+            batches = [
+                order[batch_start : batch_start + self.batch_size]
+                for batch_start in range(0, len(order), self.batch_size)
+            ]
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def embed_batch(batch: list[int]) -> list[list[float]]:
+                async with semaphore:
+                    return await self._embed_batch([uncached_texts[k] for k in batch])
+
+            responses = await asyncio.gather(
+                *[embed_batch(batch) for batch in batches],
+                return_exceptions=True,
+            )
+            for batch, embeddings in zip(batches, responses):
+                if isinstance(embeddings, BaseException):
                     # If embedding fails, leave as None (will be filtered out)
-                    pass
+                    continue
+                for k, embedding in zip(batch, embeddings):
+                    idx = uncached_indices[k]
+                    embedding = normalize(embedding)
+                    results[idx] = embedding
+                    self.cache.set(texts[idx], embedding)
+            self.cache.flush()
 
         return [r if r else [] for r in results]
 
@@ -133,14 +287,12 @@ class EmbeddingRanker(Ranker):
         query_embedding = embeddings[0]
         chunk_embeddings = embeddings[1:]
 
-        # Score by cosine similarity
-        scored = []
-        for chunk, embedding in zip(chunks, chunk_embeddings):
-            if embedding:
-                score = cosine_similarity(query_embedding, embedding)
-            else:
-                score = 0.0
-            scored.append(ScoredChunk(chunk=chunk, score=score))
+        # Embeddings are unit length, so cosine similarity is just the dot product
+        sumprod = math.sumprod
+        scored = [
+            ScoredChunk(chunk=chunk, score=sumprod(query_embedding, embedding) if embedding else 0.0)
+            for chunk, embedding in zip(chunks, chunk_embeddings)
+        ]
 
         scored.sort(key=lambda x: x.score, reverse=True)
         return scored
@@ -4,10 +4,13 @@ import asyncio
 import os
 
 from ..chunkers.base import Chunk
-from ..analyzers.importance import compute_file_importance, compute_centrality
+from ..analyzers.importance import build_centrality_index, compute_file_importance, compute_centrality
 from .base import Ranker, ScoredChunk
 from .keyword import KeywordRanker
 
+# Seconds to wait for HyDE once the plain-query embeddings are ready
+HYDE_TIMEOUT = float(os.environ.get("LMFETCH_HYDE_TIMEOUT", "1.5"))
+
 
 class HybridRanker(Ranker):
     def __init__(
@@ -42,82 +45,92 @@ class HybridRanker(Ranker):
                 self.use_embeddings = False
         return self._embedding_ranker
 
-    async def rank(self, query: str, chunks: list[Chunk]) -> list[ScoredChunk]:
-        if not chunks:
-            return []
-
-        # Keyword scores
+    async def _keyword_scores(self, query: str, chunks: list[Chunk]) -> dict[tuple[str, int], float]:
         keyword_scored = await self.keyword_ranker.rank(query, chunks)
-        keyword_scores = {s.chunk.path + str(s.chunk.start_line): s.score for s in keyword_scored}
-
-        # Embedding scores (if available)
-        embedding_scores: dict[str, float] = {}
-        if self.use_embeddings:
-            embedding_ranker = self._get_embedding_ranker()
-            if embedding_ranker:
-                try:
-                    # HyDE Generation
-                    if self.use_hyde:
+        return {(s.chunk.path, s.chunk.start_line): s.score for s in keyword_scored}
+
+    async def _embedding_scores(self, query: str, chunks: list[Chunk]) -> dict[tuple[str, int], float]:
+        embedding_scores: dict[tuple[str, int], float] = {}
+        embedding_ranker = self._get_embedding_ranker()
+        if embedding_ranker:
+            hyde_task = None
+            try:
+                # Generate the HyDE document while the plain query ranks: the
+                # chunk embeddings (the slow part) don't depend on it.
+                if self.use_hyde:
+                    from ..analyzers.llm import generate_hypothetical_doc
+                    hyde_task = asyncio.create_task(generate_hypothetical_doc(query))
+                    # Retrieve a failure nobody waited for (e.g. the embedding
+                    # call raised first) so it isn't logged as never retrieved
+                    hyde_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+                embedding_scored = await embedding_ranker.rank(query, chunks)
+
+                if hyde_task:
+                    # Only wait a little longer than the embeddings took
+                    done, _ = await asyncio.wait([hyde_task], timeout=HYDE_TIMEOUT)
+                    if hyde_task in done and hyde_task.exception() is None:
+                        hypothetical_doc = hyde_task.result()
+                        # Concatenation is simplest for now: "Query\n---\nHypothetical Doc"
+                        enhanced_query = f"{query}\n---\n{hypothetical_doc[:1000]}"
                         try:
-                            # Use OpenAI fallback or similar, but we need a generative model here.
-                            # Since we don't have a reliable "generate_text" client linked here easily 
-                            # (except loading ai_query), we'll try to use it.
-                            from ai_query import generate_text, openai, google, anthropic
-                            
-                            # Simple heuristics for model selection
-                            model_name = os.environ.get("LMFETCH_MODEL", "gemini-3-flash-preview")
-                            if "gpt" in model_name:
-                                model = openai(model_name)
-                            elif "claude" in model_name:
-                                model = anthropic(model_name)
-                            else:
-                                # Default to google or what's available
-                                model = google(model_name)
-
-                            hyde_prompt = (
-                                f"Write a hypothetical code snippet or documentation that answers the question: '{query}'. "
-                                "Do not explain, just provide the code/doc."
-                            )
-                            # Short timeout for speed
-                            from ..utils import retry
-                            
-                            @retry(retries=2, delay=0.5)
-                            async def _gen_hyde():
-                                return await generate_text(model=model, prompt=hyde_prompt)
-                                
-                            hypothetical_doc = (await _gen_hyde()).text
-                            
-                            # Combine query + hypothetical doc
-                            query_elements = [query, hypothetical_doc[:1000]] # Limit size
-                            
-                            # We need EmbeddingRanker to support list of queries? 
-                            # Currently rank() takes str. 
-                            # We can just concatenate or average?
-                            # Concatenation is simplest for now: "Query\n---\nHypothetical Doc"
-                            enhanced_query = f"{query}\n---\n{hypothetical_doc[:1000]}"
+                            # Chunk embeddings are cached now; only the query is embedded
                             embedding_scored = await embedding_ranker.rank(enhanced_query, chunks)
                         except Exception:
-                            # Fallback to normal query if HyDE fails (e.g. no gen model)
-                            embedding_scored = await embedding_ranker.rank(query, chunks)
-                    else:
-                        embedding_scored = await embedding_ranker.rank(query, chunks)
+                            pass
 
-                    embedding_scores = {s.chunk.path + str(s.chunk.start_line): s.score for s in embedding_scored}
-                except Exception:
-                    pass
-
-        # Importance scores
-        importance_scores: dict[str, float] = {}
+                embedding_scores = {(s.chunk.path, s.chunk.start_line): s.score for s in embedding_scored}
+            except Exception:
+                pass
+            finally:
+                # Past the timeout a HyDE answer can't change this ranking;
+                # don't leave its LLM request running (no-op once done)
+                if hyde_task:
+                    hyde_task.cancel()
+
+        return embedding_scores
+
+    def _importance_scores(self, chunks: list[Chunk]) -> dict[tuple[str, int], float]:
+        importance_scores: dict[tuple[str, int], float] = {}
+        incoming_counts = build_centrality_index(self.dependency_graph)
+        # Importance is per file; most files contribute several chunks
+        per_path: dict[str, float] = {}
         for chunk in chunks:
-            key = chunk.path + str(chunk.start_line)
-            base_importance = compute_file_importance(chunk.path)
-            centrality = compute_centrality(chunk.path, self.dependency_graph)
-            importance_scores[key] = base_importance * 0.7 + centrality * 0.3
+            key = (chunk.path, chunk.start_line)
+            score = per_path.get(chunk.path)
+            if score is None:
+                base_importance = compute_file_importance(chunk.path)
+                centrality = compute_centrality(chunk.path, incoming_counts, self.dependency_graph)
+                score = per_path[chunk.path] = base_importance * 0.7 + centrality * 0.3
+            importance_scores[key] = score
+        return importance_scores
+
+    async def rank(self, query: str, chunks: list[Chunk]) -> list[ScoredChunk]:
+        if not chunks:
+            return []
+
+        # Start the embedding flow first so its network calls (HyDE, embed API)
+        # are in flight while BM25 and importance scoring run.
+        embedding_task = (
+            asyncio.create_task(self._embedding_scores(query, chunks))
+            if self.use_embeddings
+            else None
+        )
+        try:
+            keyword_scores, importance_scores = await asyncio.gather(
+                self._keyword_scores(query, chunks),
+                asyncio.to_thread(self._importance_scores, chunks),
+            )
+            embedding_scores = await embedding_task if embedding_task else {}
+        finally:
+            # Only does anything if keyword or importance scoring raised
+            if embedding_task:
+                embedding_task.cancel()
 
         # Combine scores
         scored = []
         for chunk in chunks:
-            key = chunk.path + str(chunk.start_line)
+            key = (chunk.path, chunk.start_line)
 
             kw_score = keyword_scores.get(key, 0.0)
             emb_score = embedding_scores.get(key, 0.0) if embedding_scores else kw_score
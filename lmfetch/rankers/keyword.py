@@ -2,27 +2,83 @@
 
 import re
 import math
-from collections import Counter
+from collections import Counter, defaultdict
 from ..chunkers.base import Chunk
 from .base import Ranker, ScoredChunk
 
 
+_TOKEN = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+# camelCase / PascalCase / snake_case pieces; acronyms stay attached ("HTTPResponse")
+_SUBWORD = re.compile(r"[A-Z]*[a-z]+|[A-Z]+")
+
+
 def tokenize(text: str) -> list[str]:
-    text = text.lower()
-    tokens = re.findall(r"[a-z][a-z0-9_]*", text)
     expanded = []
-    for token in tokens:
-        expanded.append(token)
-        parts = re.findall(r"[a-z]+", re.sub(r"([a-z])([A-Z])", r"\1_\2", token).lower())
+    for token in _TOKEN.findall(text):
+        expanded.append(token.lower())
+        parts = _SUBWORD.findall(token)
         if len(parts) > 1:
-            expanded.extend(parts)
+            expanded.extend(part.lower() for part in parts)
     return expanded
 
 
+def _term_stats(chunk: Chunk) -> tuple[Counter, int]:
+    """Term frequencies and length of a chunk, computed once per chunk."""
+    stats = getattr(chunk, "_term_stats", None)
+    if stats is None:
+        tokens = tokenize(chunk.content)
+        stats = (Counter(tokens), len(tokens))
+        setattr(chunk, "_term_stats", stats)
+    return stats
+
+
 class KeywordRanker(Ranker):
     def __init__(self, k1: float = 1.5, b: float = 0.75):
         self.k1 = k1
         self.b = b
+        self._indexed_chunks: list[Chunk] | None = None
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.dls: list[int] = []
+        self.avg_dl = 0.0
+        self.n_docs = 0
+        self.idfs: dict[str, float] = {}
+        self.length_norms: list[float] = []
+
+    def index(self, chunks: list[Chunk]):
+        """Build the inverted index (term -> [(doc_id, tf)]) for a corpus.
+
+        rank() indexes automatically when given a different chunk list, so
+        calling this up front is only needed to pay the cost ahead of time.
+        """
+        postings: defaultdict[str, list[tuple[int, int]]] = defaultdict(list)
+        dls = []
+        for doc_id, chunk in enumerate(chunks):
+            term_freqs, dl = _term_stats(chunk)
+            dls.append(dl)
+            for term, tf in term_freqs.items():
+                postings[term].append((doc_id, tf))
+
+        self.postings = dict(postings)
+        self.dls = dls
+        # Plain locals, not chained "self.x = x = ..." targets: Cython
+        # miscompiles those when a comprehension below reads them
+        n_docs = len(chunks)
+        avg_dl = sum(dls) / len(dls) if dls else 0.0
+        self.n_docs = n_docs
+        self.avg_dl = avg_dl
+        self._indexed_chunks = chunks
+
+        # Everything in BM25 except tf is fixed per corpus; precompute it so
+        # the query-time loop is a single multiply-divide per posting.
+        self.idfs = {
+            term: math.log((n_docs - len(plist) + 0.5) / (len(plist) + 0.5) + 1)
+            for term, plist in self.postings.items()
+        }
+        k1, b = self.k1, self.b
+        self.length_norms = [
+            k1 * (1 - b + b * dl / avg_dl) if avg_dl else k1 * (1 - b)
+            for dl in dls
+        ]
 
     async def rank(self, query: str, chunks: list[Chunk]) -> list[ScoredChunk]:
         if not chunks:
@@ -32,14 +88,12 @@ class KeywordRanker(Ranker):
         if not query_tokens:
             return [ScoredChunk(chunk=c, score=0.0) for c in chunks]
 
-        doc_tokens = [tokenize(c.content) for c in chunks]
-        doc_freqs = self._compute_doc_freqs(doc_tokens)
-        avg_dl = sum(len(d) for d in doc_tokens) / len(doc_tokens)
-        n_docs = len(chunks)
+        if self._indexed_chunks is not chunks or self.n_docs != len(chunks):
+            self.index(chunks)
+        bm25_scores = self._bm25_scores(query_tokens)
 
         scored = []
-        for chunk, tokens in zip(chunks, doc_tokens):
-            score = self._bm25_score(query_tokens, tokens, doc_freqs, avg_dl, n_docs)
+        for chunk, score in zip(chunks, bm25_scores):
             path_bonus = self._path_bonus(query_tokens, chunk.path)
             name_bonus = self._name_bonus(query_tokens, chunk.name) if chunk.name else 0
             final_score = score + path_bonus + name_bonus
@@ -54,34 +108,20 @@ class KeywordRanker(Ranker):
 
         return scored
 
-    def _compute_doc_freqs(self, doc_tokens: list[list[str]]) -> dict[str, int]:
-        doc_freqs = Counter()
-        for tokens in doc_tokens:
-            doc_freqs.update(set(tokens))
-        return doc_freqs
-
-    def _bm25_score(
-        self,
-        query_tokens: set[str],
-        doc_tokens: list[str],
-        doc_freqs: dict[str, int],
-        avg_dl: float,
-        n_docs: int,
-    ) -> float:
-        dl = len(doc_tokens)
-        term_freqs = Counter(doc_tokens)
-        score = 0.0
+    def _bm25_scores(self, query_tokens: set[str]) -> list[float]:
+        """BM25 score of every indexed doc, walking only the query terms' postings."""
+        scores = [0.0] * self.n_docs
+        length_norms = self.length_norms
 
         for term in query_tokens:
-            if term not in term_freqs:
+            postings = self.postings.get(term)
+            if not postings:
                 continue
-            tf = term_freqs[term]
-            df = doc_freqs.get(term, 0)
-            idf = math.log((n_docs - df + 0.5) / (df + 0.5) + 1)
-            tf_component = (tf * (self.k1 + 1)) / (tf + self.k1 * (1 - self.b + self.b * dl / avg_dl))
-            score += idf * tf_component
+            weight = self.idfs[term] * (self.k1 + 1)
+            for doc_id, tf in postings:
+                scores[doc_id] += weight * tf / (tf + length_norms[doc_id])
 
-        return score
+        return scores
 
     def _path_bonus(self, query_tokens: set[str], path: str) -> float:
         path_tokens = set(tokenize(path))
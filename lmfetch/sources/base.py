@@ -1,6 +1,7 @@
 """Base source interface."""
 
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -18,3 +19,20 @@ class Source(ABC):
     async def scan(self) -> list[SourceItem]:
         """Scan and return all items from this source."""
         ...
+
+    async def iter_items(self) -> AsyncIterator[SourceItem]:
+        """Yield items as they become available, in no particular order.
+
+        Defaults to the items of scan(); sources that read files one by one
+        override it so consumers can start on early items.
+        """
+        for item in await self.scan():
+            yield item
+
+    async def fingerprint(self) -> str | None:
+        """Return a cheap signature that changes when the scanned content changes.
+
+        Returning None means the source cannot be fingerprinted and must be
+        rescanned on every build.
+        """
+        return None
@@ -1,10 +1,13 @@
 """Codebase source - scans local directories."""
 
 import asyncio
+import fnmatch
+import hashlib
+import os
+import re
+from collections.abc import AsyncIterator
 from pathlib import Path
 
-import aiofiles
-
 from .base import Source, SourceItem
 
 IGNORE_DIRS = {
@@ -29,6 +32,7 @@ BINARY_EXTENSIONS = {
     ".woff", ".woff2", ".ttf", ".eot",
     ".pyc", ".pyo", ".class", ".o",
 }
+_BINARY_SUFFIXES = tuple(BINARY_EXTENSIONS)
 
 LANGUAGE_MAP = {
     ".py": "python", ".js": "javascript", ".ts": "typescript",
@@ -54,72 +58,126 @@ class CodebaseSource(Source):
         include: list[str] | None = None,
         exclude: list[str] | None = None,
         force_large: bool = False,
+        path_prefix: str = "",
     ):
         self.path = Path(path).resolve()
         self.include = include or []
         self.exclude = exclude or []
         self.force_large = force_large
+        # Prepended to every item path (e.g. "owner/repo/" for GitHub sources)
+        self.path_prefix = path_prefix
+        self._include_re = _compile_patterns(self.include)
+        self._exclude_re = _compile_patterns(self.exclude)
 
     async def scan(self) -> list[SourceItem]:
-        items = []
-        files = self._find_files()
-
-        semaphore = asyncio.Semaphore(100)
-
-        async def read_file(file_path: Path) -> SourceItem | None:
-            async with semaphore:
-                try:
-                    # Check file size (1MB)
-                    size = file_path.stat().st_size
-                    if size > 1024 * 1024 and not self.force_large:
-                        return None
-
-                    async with aiofiles.open(file_path, "r", encoding="utf-8", errors="replace") as f:
-                        content = await f.read()
-                    
-                    # Check line count (20k)
-                    if len(content.splitlines()) > 20000 and not self.force_large:
-                        return None
-
-                    rel_path = str(file_path.relative_to(self.path))
-                    lang = LANGUAGE_MAP.get(file_path.suffix.lower())
-                    return SourceItem(path=rel_path, content=content, language=lang)
-                except Exception:
-                    return None
-
-        results = await asyncio.gather(*[read_file(f) for f in files])
-        return [r for r in results if r is not None]
+        items = [item async for item in self.iter_items()]
+        # Reads complete out of order; keep the result deterministic
+        items.sort(key=lambda item: item.path)
+        return items
+
+    async def iter_items(self, max_in_flight: int = 100) -> AsyncIterator[SourceItem]:
+        """Yield items as their reads complete, with at most max_in_flight reads open.
+
+        The builder hashes and looks up each file while later reads are still
+        in flight; scan() collects and sorts the same items.
+        """
+        files = iter(self._find_files())
+        pending: set[asyncio.Task] = set()
+
+        def fill():
+            for file_path in files:
+                pending.add(asyncio.create_task(self._read_file(file_path)))
+                if len(pending) >= max_in_flight:
+                    break
+
+        fill()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending.difference_update(done)
+                fill()
+                for task in done:
+                    item = task.result()
+                    if item is not None:
+                        yield item
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _read_file(self, file_path: Path) -> SourceItem | None:
+        content = await asyncio.to_thread(self._load, file_path)
+        if content is None:
+            return None
+        rel_path = self.path_prefix + str(file_path.relative_to(self.path))
+        lang = LANGUAGE_MAP.get(file_path.suffix.lower())
+        return SourceItem(path=rel_path, content=content, language=lang)
+
+    def _load(self, file_path: Path) -> str | None:
+        # Runs in a worker thread so stat and read never block the event loop
+        try:
+            # Check file size (1MB)
+            size = file_path.stat().st_size
+            if size > 1024 * 1024 and not self.force_large:
+                return None
+
+            content = file_path.read_text(encoding="utf-8", errors="replace")
+
+            # Check line count (20k); a final line without "\n" still counts,
+            # as it did with len(content.splitlines())
+            lines = content.count("\n") + (not content.endswith("\n"))
+            if lines > 20000 and not self.force_large:
+                return None
+            return content
+        except Exception:
+            return None
+
+    async def fingerprint(self) -> str | None:
+        return await asyncio.to_thread(self._fingerprint)
+
+    def _fingerprint(self) -> str | None:
+        # Stat-only walk over the files scan() would read: any edit, rename,
+        # addition or removal changes the digest.
+        digest = hashlib.blake2b(digest_size=16)
+        for file_path in self._find_files():
+            try:
+                st = file_path.stat()
+            except OSError:
+                continue
+            digest.update(f"{file_path}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+        return digest.hexdigest()
 
     def _find_files(self) -> list[Path]:
         files = []
-        for item in self.path.rglob("*"):
-            if not item.is_file():
-                continue
-            if self._should_ignore(item):
-                continue
-            if self.include and not self._matches_patterns(item, self.include):
-                continue
-            if self.exclude and self._matches_patterns(item, self.exclude):
-                continue
-            files.append(item)
+        root_path = str(self.path)
+        for root, dirs, names in os.walk(root_path):
+            # Prune in place so os.walk never descends into ignored trees
+            dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
+            rel_root = os.path.relpath(root, root_path)
+            for name in names:
+                if self._should_ignore(name):
+                    continue
+                rel_path = name if rel_root == "." else os.path.join(rel_root, name)
+                if self._include_re and not self._matches_patterns(rel_path, name, self._include_re):
+                    continue
+                if self._exclude_re and self._matches_patterns(rel_path, name, self._exclude_re):
+                    continue
+                files.append(Path(root, name))
         return files
 
-    def _should_ignore(self, path: Path) -> bool:
-        try:
-            rel_path = path.relative_to(self.path)
-            for part in rel_path.parts:
-                if part in IGNORE_DIRS:
-                    return True
-        except ValueError:
-            # Should not happen if path is inside self.path
-            pass
-        if path.name in IGNORE_FILES:
+    def _should_ignore(self, name: str) -> bool:
+        if name in IGNORE_FILES or name in IGNORE_DIRS:
             return True
-        if path.suffix.lower() in BINARY_EXTENSIONS:
-            return True
-        return False
+        return name.lower().endswith(_BINARY_SUFFIXES)
+
+    def _matches_patterns(self, rel_path: str, name: str, pattern: re.Pattern) -> bool:
+        # normcase both sides like fnmatch.fnmatch: on Windows this unifies
+        # separators and case, so "src/*.py" still matches a backslashed path
+        normcase = os.path.normcase
+        return bool(pattern.match(normcase(rel_path)) or pattern.match(normcase(name)))
+
 
-    def _matches_patterns(self, path: Path, patterns: list[str]) -> bool:
-        from fnmatch import fnmatch
-        rel_path = str(path.relative_to(self.path))
-        return any(fnmatch(rel_path, p) or fnmatch(path.name, p) for p in patterns)
+def _compile_patterns(patterns: list[str]) -> re.Pattern | None:
+    """Fold glob patterns into one regex, matching like fnmatch on any of them."""
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(os.path.normcase(p)) for p in patterns))
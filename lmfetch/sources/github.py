@@ -1,36 +1,233 @@
 """GitHub repository source - clones repos temporarily."""
 
 import asyncio
+import functools
+import hashlib
 import os
 import time
 import re
-import shutil
-import tempfile
+import weakref
 from pathlib import Path
 
 from .base import Source, SourceItem
+from . import codebase
 from .codebase import CodebaseSource
+from ..utils import CACHE_ROOT
+
+
+_CACHE_BASE = CACHE_ROOT / "repos"
+
+# owner/repo, an optional .git suffix, then either a /tree/<branch>/<subpath>
+# or any other trailing page (blob, issues, ...), which is ignored.
+_URL_RE = re.compile(
+    r"(?:https?://)?github\.com/(?P<owner>[^/]+)/(?P<repo>[^/]+?)(?:\.git)?"
+    r"(?:/tree/[^/]+/(?P<subpath>.+?)|/.*)?/?$"
+)
+
+# Seconds before a cached clone is checked against GitHub again
+REPO_TTL = int(os.environ.get("LMFETCH_REPO_TTL", "3600"))
+# repo path -> (time.monotonic() of the last check in this process, head sha)
+_last_checked: dict[Path, tuple[float, str | None]] = {}
+
+# Part of every scanned-items cache key. Bump ITEMS_CACHE_VERSION when
+# SourceItem or the pickle layout changes; edits to the scan tables in
+# codebase.py change the digest on their own.
+ITEMS_CACHE_VERSION = 1
+_SCAN_RULES = repr((
+    sorted(codebase.IGNORE_DIRS), sorted(codebase.IGNORE_FILES),
+    sorted(codebase.BINARY_EXTENSIONS), sorted(codebase.LANGUAGE_MAP.items()),
+))
 
 
 def parse_github_url(url: str) -> tuple[str, str, str | None] | None:
     """Parse GitHub URL into (owner, repo, subpath)."""
-    url = url.rstrip("/")
+    return _parse_github_url(url)
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_github_url(url: str) -> tuple[str, str, str | None] | None:
+    match = _URL_RE.match(url)
+    if not match:
+        return None
+    return match["owner"], match["repo"], match["subpath"]
+
+
+_config_args: tuple[str, ...] | None = None
+
+
+async def _git_config_args() -> tuple[str, ...]:
+    """Extra -c options for every git call, computed once per process."""
+    global _config_args
+    if _config_args is None:
+        # HTTP/2 lets curl multiplex a fetch's requests over a single connection
+        args = ["-c", "http.version=HTTP/2"]
+        ssh_command = await _ssh_multiplexing_command()
+        if ssh_command:
+            args += ["-c", f"core.sshCommand={ssh_command}"]
+        _config_args = tuple(args)
+    return _config_args
+
+
+async def _ssh_multiplexing_command() -> str | None:
+    """ssh command sharing one master connection per host, if safe to inject.
+
+    Remotes rewritten to SSH (url.insteadOf) then share a connection across
+    the clones and fetches of a run. Anyone who already configures how git
+    runs ssh (GIT_SSH_COMMAND, GIT_SSH or core.sshCommand) is left alone,
+    since a -c core.sshCommand would override the latter two.
+    """
+    if os.name == "nt" or os.environ.get("GIT_SSH_COMMAND") or os.environ.get("GIT_SSH"):
+        return None
+    process = await asyncio.create_subprocess_exec(
+        "git", "config", "--get", "core.sshCommand",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await process.communicate()
+    if stdout.strip():
+        return None
+
+    # Private directory for the control sockets, never a shared temp dir
+    control_dir = CACHE_ROOT / "ssh"
+    try:
+        control_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        control_dir.chmod(0o700)
+    except OSError:
+        return None
+    # %C expands to 40 hex chars; Unix socket paths are limited to ~104 bytes
+    if len(str(control_dir)) + 41 > 100:
+        return None
+    control_path = control_dir / "%C"
+    return f"ssh -o ControlMaster=auto -o ControlPersist=60 -o ControlPath={control_path}"
+
+
+# Cap on concurrent git processes across all sources, so scanning many repos
+# overlaps their network time without piling up clones.
+GIT_CONCURRENCY = int(os.environ.get("LMFETCH_GIT_CONCURRENCY", "8"))
+_git_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _git_semaphore() -> asyncio.Semaphore:
+    # One per event loop: a semaphore can't be shared across asyncio.run() calls
+    loop = asyncio.get_running_loop()
+    semaphore = _git_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _git_semaphores[loop] = asyncio.Semaphore(GIT_CONCURRENCY)
+    return semaphore
+
+
+async def _git(*args: str, cwd: Path | None = None) -> tuple[int, bytes]:
+    """Run a git command, returning its exit code and stderr."""
+    async with _git_semaphore():
+        process = await asyncio.create_subprocess_exec(
+            "git", *(await _git_config_args()), *args,
+            cwd=str(cwd) if cwd else None,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _lower_priority(process.pid)
+        stderr = await _drain(process)
+    assert process.returncode is not None  # set by process.wait() in _drain
+    return process.returncode, stderr
+
+
+# Niceness added to clone/fetch/checkout work so its decompression doesn't
+# starve the event loop (and the rest of the machine)
+GIT_NICENESS = 5
+
+
+def _lower_priority(pid: int):
+    # Set from the parent right after spawn rather than via preexec_fn, which
+    # would force the slow fork path; git only forks its heavy helpers
+    # (remote-https, index-pack) after the first network round trip.
+    if not hasattr(os, "setpriority"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, 0) + GIT_NICENESS)
+    except OSError:
+        pass
+
+
+async def _drain(process: asyncio.subprocess.Process, cap: int = 65536) -> bytes:
+    """Read stderr to EOF and wait for exit, keeping at most the last cap bytes.
+
+    git can write megabytes of progress; the tail is where errors end up.
+    """
+    assert process.stderr is not None  # spawned with stderr=PIPE
+    buf = bytearray()
+    while chunk := await process.stderr.read(4096):
+        buf += chunk
+        if len(buf) > cap:
+            del buf[:-cap]
+    await process.wait()
+    return bytes(buf)
+
+
+async def _git_output(*args: str, cwd: Path | None = None) -> str | None:
+    """Run a git command and return its stdout, or None if it failed."""
+    async with _git_semaphore():
+        process = await asyncio.create_subprocess_exec(
+            "git", *(await _git_config_args()), *args,
+            cwd=str(cwd) if cwd else None,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await process.communicate()
+    if process.returncode != 0:
+        return None
+    return stdout.decode(errors="replace")
+
+
+def _load_items(path: Path) -> list[SourceItem] | None:
+    import pickle
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
 
-    patterns = [
-        r"(?:https?://)?github\.com/([^/]+)/([^/]+)(?:/tree/[^/]+/(.+))?",
-        r"(?:https?://)?github\.com/([^/]+)/([^/]+)(?:/blob/[^/]+/(.+))?",
-        r"(?:https?://)?github\.com/([^/]+)/([^/]+)",
-    ]
+def _save_items(path: Path, items: list[SourceItem]):
+    import pickle
+    head = path.name.split("-", 1)[0]
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(items, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        # Scans of older commits can't be hit again
+        for stale in path.parent.glob("*.pkl"):
+            if not stale.name.startswith(head):
+                stale.unlink(missing_ok=True)
+    except Exception:
+        pass
 
-    for pattern in patterns:
-        match = re.match(pattern, url)
-        if match:
-            owner = match.group(1)
-            repo = match.group(2).replace(".git", "")
-            subpath = match.group(3) if match.lastindex >= 3 else None
-            return owner, repo, subpath
 
-    return None
+def _repo_index():
+    try:
+        from ..cache import SQLiteCache
+        return SQLiteCache()
+    except Exception:
+        return None
+
+
+def _get_repo_record(index, owner: str, repo: str) -> tuple[str | None, float] | None:
+    if index is None:
+        return None
+    try:
+        return index.get_repo(owner, repo)
+    except Exception:
+        return None
+
+
+def _save_repo_record(index, owner: str, repo: str, head: str | None):
+    if index is None:
+        return
+    try:
+        index.save_repo(owner, repo, head, time.time())
+    except Exception:
+        pass
 
 
 class GitHubSource(Source):
@@ -51,7 +248,11 @@ class GitHubSource(Source):
         self.exclude = exclude
         self.depth = depth
         self.force_large = force_large
-        self._temp_dir: Path | None = None
+
+    @classmethod
+    async def scan_many(cls, sources: list["GitHubSource"]) -> list[list[SourceItem]]:
+        """Scan several repos concurrently; git work is bounded by GIT_CONCURRENCY."""
+        return await asyncio.gather(*(source.scan() for source in sources))
 
     @property
     def clone_url(self) -> str:
@@ -59,56 +260,177 @@ class GitHubSource(Source):
 
     async def scan(self) -> list[SourceItem]:
         # Cache structure: ~/.cache/lmfetch/repos/<owner>/<repo>
-        cache_base = Path.home() / ".cache" / "lmfetch" / "repos"
-        repo_path = cache_base / self.owner / self.repo
-        self._temp_dir = None
-
-        if repo_path.exists():
-            # Check if we should update (TTL: 1 hour)
-            last_update = 0
-            git_head = repo_path / ".git" / "HEAD"
-            if git_head.exists():
-                last_update = git_head.stat().st_mtime
-            
-            # Default TTL: 3600 seconds (1 hour)
-            if time.time() - last_update > 3600:
-                # Update existing repo
-                process = await asyncio.create_subprocess_exec(
-                    "git", "pull",
-                    cwd=str(repo_path),
-                    stdout=asyncio.subprocess.DEVNULL,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                _, stderr = await process.communicate()
-                # Ignore pull errors (might be detached head, etc), just proceed
-        else:
-            # Clone new repo
-            repo_path.parent.mkdir(parents=True, exist_ok=True)
-            process = await asyncio.create_subprocess_exec(
-                "git", "clone", "--depth", str(self.depth), "--single-branch",
-                self.clone_url, str(repo_path),
-                stdout=asyncio.subprocess.DEVNULL,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            _, stderr = await process.communicate()
+        repo_path = _CACHE_BASE / self.owner / self.repo
 
-            if process.returncode != 0:
-                raise RuntimeError(f"git clone failed: {stderr.decode()}")
+        recent = _last_checked.get(repo_path)
+        if recent is not None and time.monotonic() - recent[0] < REPO_TTL:
+            # Already checked by this process; skip the index and git entirely
+            head = recent[1]
+            complete = await self._sync_sparse_checkout(repo_path)
+        elif repo_path.exists():
+            head = await self._update(repo_path)
+            complete = await self._sync_sparse_checkout(repo_path)
+        else:
+            head = await self._clone(repo_path)
+            complete = True
 
         scan_path = repo_path
         if self.subpath:
             scan_path = scan_path / self.subpath
 
+        # An unchanged checkout scanned with the same options yields the same items
+        items_path = self._items_cache_path(head) if head else None
+        if items_path:
+            items = await asyncio.to_thread(_load_items, items_path)
+            if items is not None:
+                return items
+
+        # Prefix paths with repo name for clarity
         source = CodebaseSource(
             scan_path, 
             include=self.include, 
             exclude=self.exclude,
-            force_large=self.force_large
+            force_large=self.force_large,
+            path_prefix=f"{self.owner}/{self.repo}/",
         )
         items = await source.scan()
 
-        # Prefix paths with repo name for clarity
-        for item in items:
-            item.path = f"{self.owner}/{self.repo}/{item.path}"
-
+        # A checkout the sparse sync couldn't widen may be missing files;
+        # don't pin that scan to the head
+        if items_path and complete:
+            await asyncio.to_thread(_save_items, items_path, items)
         return items
+
+    async def fingerprint(self) -> str | None:
+        # The checked-out head identifies the content while it's within the
+        # TTL; the URL and scan options are already part of the caller's key.
+        # Past the TTL the next scan may move the checkout, so don't guess.
+        repo_path = _CACHE_BASE / self.owner / self.repo
+        recent = _last_checked.get(repo_path)
+        if recent is not None and time.monotonic() - recent[0] < REPO_TTL:
+            return recent[1]
+        record = _get_repo_record(_repo_index(), self.owner, self.repo)
+        if record and time.time() - record[1] <= REPO_TTL and repo_path.exists():
+            return record[0]
+        return None
+
+    def _items_cache_path(self, head: str) -> Path:
+        # Cache structure: ~/.cache/lmfetch/items/<owner>/<repo>/<head>-<options>.pkl
+        options = repr((
+            ITEMS_CACHE_VERSION, _SCAN_RULES,
+            self.subpath, self.include, self.exclude, self.force_large,
+        ))
+        key = hashlib.blake2b(options.encode(), digest_size=16).hexdigest()
+        items_dir = CACHE_ROOT / "items" / self.owner / self.repo
+        return items_dir / f"{head}-{key}.pkl"
+
+    async def _update(self, repo_path: Path) -> str | None:
+        """Refresh a cached clone if its TTL expired; returns the checked-out head."""
+        index = _repo_index()
+        record = _get_repo_record(index, self.owner, self.repo)
+
+        # Check if we should update. The index stores wall-clock times since it
+        # outlives the process; clones from before the index existed fall back
+        # to the age of .git/HEAD.
+        if record:
+            head, last_update = record
+        else:
+            head = None
+            try:
+                last_update = (repo_path / ".git" / "HEAD").stat().st_mtime
+            except OSError:
+                last_update = 0
+
+        if time.time() - last_update <= REPO_TTL:
+            _last_checked[repo_path] = (time.monotonic(), head)
+            return head
+
+        # Most expired repos haven't moved; one ls-remote round trip
+        # settles that without negotiating a fetch.
+        remote_head = await self._remote_head(repo_path)
+        if head is None:
+            head = await self._local_head(repo_path)
+        up_to_date = remote_head is not None and remote_head == head
+        if not up_to_date:
+            # Update existing repo: a shallow fetch of the tracked branch
+            # and a hard reset onto it. Unlike pull this never merges, so it
+            # can't wedge on divergent history from an earlier shallow fetch.
+            returncode, _ = await _git(
+                "fetch", "--depth", str(self.depth), "--no-tags", "origin",
+                cwd=repo_path,
+            )
+            if returncode == 0:
+                returncode, _ = await _git("reset", "--hard", "FETCH_HEAD", cwd=repo_path)
+            if returncode == 0:
+                head = await self._local_head(repo_path)
+                up_to_date = True
+        # Ignore update errors (offline, etc), just proceed with the cached copy
+        if up_to_date:
+            _save_repo_record(index, self.owner, self.repo, head)
+            _last_checked[repo_path] = (time.monotonic(), head)
+        return head
+
+    async def _clone(self, repo_path: Path) -> str | None:
+        """Clone the repo into the cache; returns the checked-out head."""
+        repo_path.parent.mkdir(parents=True, exist_ok=True)
+        if not (self.subpath and await self._sparse_clone(repo_path)):
+            returncode, stderr = await _git(
+                "clone", "--depth", str(self.depth), "--single-branch",
+                self.clone_url, str(repo_path),
+            )
+
+            if returncode != 0:
+                raise RuntimeError(f"git clone failed: {stderr.decode()}")
+        head = await self._local_head(repo_path)
+        _save_repo_record(_repo_index(), self.owner, self.repo, head)
+        _last_checked[repo_path] = (time.monotonic(), head)
+        return head
+
+    async def _remote_head(self, repo_path: Path) -> str | None:
+        output = await _git_output("ls-remote", "origin", "HEAD", cwd=repo_path)
+        if not output:
+            return None
+        return output.split(maxsplit=1)[0]
+
+    async def _local_head(self, repo_path: Path) -> str | None:
+        output = await _git_output("rev-parse", "HEAD", cwd=repo_path)
+        return output.strip() if output else None
+
+    async def _sparse_clone(self, repo_path: Path) -> bool:
+        """Partial clone that only materializes self.subpath. False if that fails."""
+        assert self.subpath is not None
+        returncode, _ = await _git(
+            "clone", "--depth", str(self.depth), "--single-branch",
+            "--filter=blob:none", "--sparse",
+            self.clone_url, str(repo_path),
+        )
+        if returncode == 0:
+            # Cone mode only takes directories; a file subpath falls back below
+            returncode, _ = await _git("sparse-checkout", "set", self.subpath, cwd=repo_path)
+        if returncode != 0:
+            import shutil
+            shutil.rmtree(repo_path, ignore_errors=True)
+            return False
+        return True
+
+    async def _sync_sparse_checkout(self, repo_path: Path) -> bool:
+        """Widen a cached sparse clone so it covers what this scan needs.
+
+        Returns False if the checkout may still be missing files for this scan.
+        """
+        sparse_file = repo_path / ".git" / "info" / "sparse-checkout"
+        if not sparse_file.exists():
+            return True
+        if self.subpath and (repo_path / self.subpath).exists():
+            return True
+        if self.subpath:
+            returncode, _ = await _git("sparse-checkout", "add", self.subpath, cwd=repo_path)
+            if returncode == 0:
+                return True
+        # Whole repo requested (or the subpath can't be added): check out everything
+        returncode, _ = await _git("sparse-checkout", "disable", cwd=repo_path)
+        if returncode != 0:
+            return False
+        # disable keeps the pattern file; drop it so the clone reads as full
+        sparse_file.unlink(missing_ok=True)
+        return True
@@ -1,10 +1,16 @@
 import asyncio
 import functools
+import os
 import random
 import logging
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Root of every on-disk cache (chunk index, embeddings, clones). Defaults to
+# ~/.cache/lmfetch; LMFETCH_CACHE points it elsewhere (e.g. a tmpfs in CI).
+CACHE_ROOT = Path(os.environ.get("LMFETCH_CACHE") or Path.home() / ".cache" / "lmfetch")
+
 def retry(retries: int = 3, delay: float = 1.0, backoff: float = 2.0, exceptions: tuple = (Exception,)):
     """Retry an async function with exponential backoff."""
     def decorator(func):
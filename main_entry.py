@@ -1,14 +1,25 @@
-import multiprocessing
 import sys
 import os
-import certifi
-from lmfetch.cli import cli
 
-if __name__ == "__main__":
+
+def _prepare_frozen():
     # Needed for PyInstaller/Nuitka onefile multiprocessing support
+    import multiprocessing
     multiprocessing.freeze_support()
-    
+
     # Fix SSL errors in frozen app by pointing to the bundled certs
+    import certifi
     os.environ["SSL_CERT_FILE"] = certifi.where()
-    
-    cli()
+
+
+def _cli():
+    from lmfetch.cli import cli
+    return cli
+
+
+if __name__ == "__main__":
+    # PyInstaller sets sys.frozen; Nuitka defines __compiled__
+    if getattr(sys, "frozen", False) or "__compiled__" in globals():
+        _prepare_frozen()
+
+    _cli()()
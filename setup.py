@@ -10,8 +10,8 @@ if os.environ.get("LMFETCH_COMPILE") == "1":
         extensions = cythonize(
             [
                 "lmfetch/chunkers/code.py",
+                "lmfetch/rankers/keyword.py",
                 # "lmfetch/rankers/hybrid.py", 
-                # "lmfetch/rankers/keyword.py",
             ],
             compiler_directives={'language_level': "3"}
         )
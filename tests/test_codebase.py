@@ -0,0 +1,65 @@
+import asyncio
+import fnmatch
+import ntpath
+import os
+
+from lmfetch.sources import codebase
+from lmfetch.sources.codebase import CodebaseSource
+
+
+def _write(root, rel_path, content="x = 1\n"):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def _found(source):
+    return sorted(p.relative_to(source.path).as_posix() for p in source._find_files())
+
+
+def test_include_exclude_nested_paths(tmp_path):
+    for rel_path in ["src/app.py", "src/pkg/mod.py", "tests/test_app.py", "README.md"]:
+        _write(tmp_path, rel_path)
+
+    source = CodebaseSource(tmp_path, include=["src/*.py"], exclude=["*/pkg/*"])
+    assert _found(source) == ["src/app.py"]
+
+    source = CodebaseSource(tmp_path, exclude=["tests/*"])
+    assert _found(source) == ["README.md", "src/app.py", "src/pkg/mod.py"]
+
+
+def test_patterns_match_like_fnmatch_on_windows(monkeypatch):
+    # os.walk + os.path.join produce backslashed, mixed-case paths there
+    monkeypatch.setattr(codebase.os.path, "normcase", ntpath.normcase)
+    source = CodebaseSource(".", include=["src/*.py", "Tests/*"])
+    for rel_path, name in [
+        ("src\\pkg\\mod.py", "mod.py"),
+        ("SRC\\App.PY", "App.PY"),
+        ("tests\\unit\\test_a.py", "test_a.py"),
+        ("lib\\util.py", "util.py"),
+    ]:
+        expected = any(
+            fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p)
+            for p in source.include
+        )
+        assert source._matches_patterns(rel_path, name, source._include_re) == expected
+
+
+def test_patterns_are_case_sensitive_on_posix(tmp_path):
+    if os.name == "nt":
+        return
+    _write(tmp_path, "SRC/app.py")
+    assert _found(CodebaseSource(tmp_path, include=["src/*"])) == []
+
+
+def test_line_cap_boundary(tmp_path):
+    _write(tmp_path, "at_cap.py", "x\n" * 20000)
+    _write(tmp_path, "at_cap_no_newline.py", "x\n" * 19999 + "x")
+    _write(tmp_path, "over_cap_no_newline.py", "x\n" * 20000 + "x")
+    _write(tmp_path, "over_cap.py", "x\n" * 20001)
+
+    scanned = [item.path for item in asyncio.run(CodebaseSource(tmp_path).scan())]
+    assert scanned == ["at_cap.py", "at_cap_no_newline.py"]
+
+    source = CodebaseSource(tmp_path, force_large=True)
+    assert len(asyncio.run(source.scan())) == 4
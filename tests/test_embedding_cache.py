@@ -0,0 +1,22 @@
+import hashlib
+import json
+import math
+
+from lmfetch.rankers.embedding import EmbeddingCache
+
+
+def test_legacy_json_files_are_imported_once(tmp_path):
+    vectors = {f"text {i}": [float(i + 1), 2.0, 3.0] for i in range(5)}
+    for text, vector in vectors.items():
+        key = hashlib.sha256(text.encode()).hexdigest()[:16]
+        (tmp_path / f"{key}.json").write_text(json.dumps(vector))
+
+    EmbeddingCache(tmp_path)
+    assert sorted(p.name for p in tmp_path.iterdir() if p.suffix == ".json") == ["index.json"]
+
+    cache = EmbeddingCache(tmp_path)
+    for text, vector in vectors.items():
+        norm = math.hypot(*vector)
+        stored = cache.get(text)
+        assert stored is not None
+        assert all(abs(a - b / norm) < 1e-3 for a, b in zip(stored, vector))
@@ -0,0 +1,65 @@
+import asyncio
+import math
+from collections import Counter
+
+from lmfetch.chunkers.base import Chunk
+from lmfetch.rankers.keyword import KeywordRanker, tokenize
+
+
+def _chunk(path, content, name=None):
+    lines = content.count("\n") + 1
+    return Chunk(path=path, content=content, start_line=1, end_line=lines, chunk_type="function", name=name)
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("parseHTTPResponse max_retries x1") == [
+        "parsehttpresponse", "parse", "httpresponse",
+        "max_retries", "max", "retries",
+        "x1",
+    ]
+
+
+def test_rank_matches_bm25():
+    chunks = [
+        _chunk("a.py", "def load_config(path): return read(path)"),
+        _chunk("b.py", "config = load_config(config_path) # config config"),
+        _chunk("c.py", "def unrelated(): pass"),
+    ]
+    ranker = KeywordRanker()
+    scored = asyncio.run(ranker.rank("config", chunks))
+
+    docs = [Counter(tokenize(c.content)) for c in chunks]
+    lengths = [sum(d.values()) for d in docs]
+    avg_dl = sum(lengths) / len(lengths)
+    df = sum(1 for d in docs if "config" in d)
+    idf = math.log((len(docs) - df + 0.5) / (df + 0.5) + 1)
+    expected = [
+        idf * d["config"] * (ranker.k1 + 1)
+        / (d["config"] + ranker.k1 * (1 - ranker.b + ranker.b * dl / avg_dl))
+        for d, dl in zip(docs, lengths)
+    ]
+    top = max(expected)
+    by_path = {s.chunk.path: s.score for s in scored}
+    for chunk, score in zip(chunks, expected):
+        assert math.isclose(by_path[chunk.path], score / top)
+    assert [s.chunk.path for s in scored][0] == "b.py"
+
+
+def test_path_and_name_bonus():
+    chunks = [
+        _chunk("auth/session.py", "x = 1", name="refresh"),
+        _chunk("other.py", "x = 1", name="login"),
+    ]
+    scored = asyncio.run(KeywordRanker().rank("auth login", chunks))
+    scores = {s.chunk.path: s.score for s in scored}
+    assert scores == {"other.py": 1.0, "auth/session.py": 2.0 / 3.0}
+
+
+def test_reindexes_changed_corpus():
+    ranker = KeywordRanker()
+    first = [_chunk("a.py", "alpha"), _chunk("b.py", "beta")]
+    assert asyncio.run(ranker.rank("alpha", first))[0].chunk.path == "a.py"
+    second = [_chunk("c.py", "gamma"), _chunk("d.py", "alpha alpha")]
+    assert asyncio.run(ranker.rank("alpha", second))[0].chunk.path == "d.py"
+    # Term stats are cached on the chunks and reused by the next query
+    assert asyncio.run(ranker.rank("gamma", second))[0].chunk.path == "c.py"